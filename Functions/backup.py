@@ -0,0 +1,458 @@
+# backup.py
+# Incremental, content-addressed snapshots of the vault (entries, config.json, salt.bin) under Data/backups.
+#
+# Layout:
+#   objects/ab/cdef...   zlib-compressed blobs named by the SHA-256 of their content:
+#                        one per site (its JSON-encoded entry list), config.json, salt.bin
+#   snapshots/<id>.json  one per commit, ids sort by time:
+#                        {"id", "time", "full", "format": {"binary", "cipher"},
+#                         "files": {name: hash}, "sites": {site: hash, or None if removed}}
+#
+# The oldest snapshot is "full" (every site); the others only list the
+# sites changed by their commit, so a backup costs one small record plus
+# a blob per changed site, whatever the vault size. Identical content is
+# stored once. A snapshot is rebuilt by applying the records from the
+# oldest up to it. Pruning merges the records it drops into the next kept
+# one, then removes blobs no record refers to any more.
+#
+# Backups never hold key material the live vault no longer has: a master
+# password change rewrites the key fields of every stored config.json
+# (replace_keys), and wiping the vault deletes the backups (purge).
+import argparse
+import base64
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TypedDict
+from Functions import fileManager, vaultFormat
+
+BACKUP_DIR = fileManager.data_path("backups")
+
+# Vault files kept whole in every snapshot (small, rarely changed)
+FILES = ("config.json", "salt.bin")
+
+# config.json fields that unwrap the data key with a master password
+KEY_FIELDS = ("hello", "dek", "kdf")
+
+# Retention: the latest KEEP_LAST snapshots, plus the newest one of each
+# of the last KEEP_HOURLY hours, KEEP_DAILY days and KEEP_WEEKLY weeks
+KEEP_LAST = 10
+KEEP_HOURLY = 24
+KEEP_DAILY = 7
+KEEP_WEEKLY = 4
+
+# Seconds between automatic prunes
+PRUNE_INTERVAL = 3600
+
+# Threads reading blobs during a restore
+RESTORE_WORKERS = 8
+
+_lock = threading.Lock()
+# id of the newest snapshot (None until the directory has been read)
+_latest: str | None = None
+_last_prune = 0.0
+# file name -> (content, hash) of the last stored version
+_file_hashes: dict[str, tuple] = {}
+# file name -> ((mtime_ns, size), content) of the last capture_files read
+_file_contents: dict[str, tuple] = {}
+
+
+class SnapshotInfo(TypedDict):
+    id: str
+    time: float
+    full: bool
+    # sites stored in this record (all of them for a full snapshot)
+    sites: int
+
+
+class RestoreResult(TypedDict):
+    ok: bool
+    id: str
+    sites: int
+    files: list
+
+
+def _snapshot_dir(root: Path) -> Path:
+    return root / "snapshots"
+
+
+def _object_path(root: Path, digest: str) -> Path:
+    return root / "objects" / digest[:2] / digest[2:]
+
+
+def _put_object(root: Path, payload: bytes) -> str:
+    """Store `payload` unless an identical blob exists. Returns its hash."""
+    digest = hashlib.sha256(payload).hexdigest()
+    path = _object_path(root, digest)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # no fsync: a blob is only used once a snapshot record (written
+        # atomically) points at it, and its hash is checked on restore
+        tmp = path.with_name(path.name + ".part")
+        tmp.write_bytes(zlib.compress(payload, 6))
+        os.replace(tmp, path)
+    return digest
+
+
+def _get_object(root: Path, digest: str) -> bytes:
+    try:
+        payload = zlib.decompress(_object_path(root, digest).read_bytes())
+    except (OSError, zlib.error) as exc:
+        raise ValueError(f"Backup object {digest[:12]} is missing or damaged") from exc
+    if hashlib.sha256(payload).hexdigest() != digest:
+        raise ValueError(f"Backup object {digest[:12]} does not match its hash")
+    return payload
+
+
+def _encode_site(entries: list) -> bytes:
+    # binary vault records hold raw nonce/ciphertext bytes
+    return json.dumps([
+        {**e, "nonce": base64.b64encode(bytes(e["nonce"])).decode("ascii"),
+         "ct": base64.b64encode(bytes(e["ct"])).decode("ascii")}
+        if e.get("v") == vaultFormat.ENTRY_VERSION else e
+        for e in entries
+    ], sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def _decode_site(payload: bytes) -> list:
+    return [
+        {**e, "nonce": base64.b64decode(e["nonce"]), "ct": base64.b64decode(e["ct"])}
+        if e.get("v") == vaultFormat.ENTRY_VERSION else e
+        for e in json.loads(payload)
+    ]
+
+
+def capture_files() -> dict[str, bytes | None]:
+    """Return the current content of each vault file in FILES (None if missing), for `record`.
+
+    Called when a commit happens, so its snapshot holds the files as they
+    were then even if the snapshot is written later. A file is only read
+    again once its mtime or size changes.
+    """
+    files = {}
+    for name in FILES:
+        path = fileManager.data_path(name)
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            files[name] = None
+            continue
+        stamp = (st.st_mtime_ns, st.st_size)
+        known = _file_contents.get(name)
+        if known is None or known[0] != stamp:
+            known = _file_contents[name] = (stamp, path.read_bytes())
+        files[name] = known[1]
+    return files
+
+
+def _file_hash(root: Path, name: str, payload: bytes | None) -> str | None:
+    """Store `payload`, a version of vault file `name`, unless it is the last one stored. Returns its hash."""
+    if payload is None:
+        return None
+    known = _file_hashes.get(name)
+    if known is not None and known[0] == payload:
+        return known[1]
+    digest = _put_object(root, payload)
+    _file_hashes[name] = (payload, digest)
+    return digest
+
+
+def _snapshot_ids(root: Path) -> list[str]:
+    try:
+        return sorted(p.stem for p in _snapshot_dir(root).glob("*.json"))
+    except FileNotFoundError:
+        return []
+
+
+def _read_snapshot(root: Path, snapshot_id: str) -> dict:
+    try:
+        return json.loads((_snapshot_dir(root) / f"{snapshot_id}.json").read_bytes())
+    except (OSError, ValueError) as exc:
+        raise ValueError(f"Backup snapshot {snapshot_id} is missing or damaged") from exc
+
+
+def _write_snapshot(root: Path, snapshot: dict):
+    _snapshot_dir(root).mkdir(parents=True, exist_ok=True)
+    fileManager.write_atomic(_snapshot_dir(root) / f"{snapshot['id']}.json",
+                             json.dumps(snapshot, separators=(",", ":")).encode("utf-8"))
+
+
+def has_full_snapshot(root: Path = BACKUP_DIR) -> bool:
+    """True once a full snapshot exists, i.e. `record` may be given just the changed sites."""
+    global _latest
+    with _lock:
+        if _latest is None:
+            ids = _snapshot_ids(root)
+            _latest = ids[-1] if ids else ""
+        return bool(_latest)
+
+
+def record(changes: dict, binary: bool, cipher_id: int, full: bool = False,
+           files: dict[str, bytes | None] | None = None, root: Path = BACKUP_DIR) -> str:
+    """Take a snapshot after a commit and return its id.
+
+    `changes` maps each changed site to its entries (None if removed), or,
+    with `full=True`, is the whole vault. `files` is the vault files as of
+    the commit (see capture_files); they are read now if it is None. Only
+    blobs that are not stored yet are written. Old snapshots are pruned
+    every PRUNE_INTERVAL seconds.
+    """
+    if files is None:
+        files = capture_files()
+    global _latest, _last_prune
+    if not full and not has_full_snapshot(root):
+        raise ValueError("The first backup snapshot must hold the whole vault")
+    with _lock:
+        now = time.time()
+        snapshot_id = f"{time.time_ns():020d}"
+        if _latest and snapshot_id <= _latest:
+            snapshot_id = f"{int(_latest) + 1:020d}"
+        snapshot = {
+            "id": snapshot_id,
+            "time": now,
+            "full": full,
+            "format": {"binary": bool(binary), "cipher": cipher_id},
+            "files": {name: _file_hash(root, name, files.get(name)) for name in FILES},
+            "sites": {site: None if entries is None else _put_object(root, _encode_site(entries))
+                      for site, entries in changes.items()},
+        }
+        _write_snapshot(root, snapshot)
+        _latest = snapshot_id
+        prune_due = now - _last_prune >= PRUNE_INTERVAL
+        if prune_due:
+            _last_prune = now
+    if prune_due:
+        prune(root=root, now=now)
+    return snapshot_id
+
+
+def list_snapshots(root: Path = BACKUP_DIR) -> list[SnapshotInfo]:
+    """Return every snapshot, oldest first."""
+    snapshots = []
+    for snapshot_id in _snapshot_ids(root):
+        snapshot = _read_snapshot(root, snapshot_id)
+        snapshots.append({"id": snapshot_id, "time": snapshot["time"], "full": snapshot["full"],
+                          "sites": len(snapshot["sites"])})
+    return snapshots
+
+
+def _state(root: Path, snapshot_id: str | None) -> tuple[dict, dict]:
+    """Return (site -> blob hash, snapshot record) as of `snapshot_id` (the newest if None)."""
+    ids = _snapshot_ids(root)
+    if not ids:
+        raise ValueError("No backup snapshots exist")
+    if snapshot_id is None:
+        snapshot_id = ids[-1]
+    if snapshot_id not in ids:
+        raise ValueError(f"Unknown backup snapshot: {snapshot_id}")
+    sites: dict = {}
+    snapshot: dict = {}
+    for current in ids[:ids.index(snapshot_id) + 1]:
+        snapshot = _read_snapshot(root, current)
+        if snapshot["full"]:
+            sites = {}
+        sites.update(snapshot["sites"])
+    return {site: digest for site, digest in sites.items() if digest is not None}, snapshot
+
+
+def load_snapshot(snapshot_id: str | None = None, root: Path = BACKUP_DIR) -> tuple[dict, dict]:
+    """Rebuild a snapshot: return ({site: entries}, record). Raises ValueError if it is damaged."""
+    sites, snapshot = _state(root, snapshot_id)
+    digests = list(sites.values())
+    # a few large slices per worker; one task per blob costs more than the read itself
+    step = max(1, len(digests) // (RESTORE_WORKERS * 4) + 1)
+    with ThreadPoolExecutor(max_workers=RESTORE_WORKERS) as pool:
+        parts = pool.map(lambda i: [_decode_site(_get_object(root, d)) for d in digests[i:i + step]],
+                         range(0, len(digests), step))
+        entries = [site_entries for part in parts for site_entries in part]
+    return dict(zip(sites, entries)), snapshot
+
+
+def restore(snapshot_id: str | None = None, target: Path | None = None, root: Path = BACKUP_DIR) -> RestoreResult:
+    """Write password.json, config.json and salt.bin of a snapshot into `target` (the Data folder by default).
+
+    password.json is written in the snapshot's format (JSON or binary), and
+    the restored config.json selects the "json" storage engine to read it.
+    Restoring into the live vault should go through manager.restore_backup.
+    """
+    target = Path(target) if target is not None else fileManager.get_data_dir()
+    data, snapshot = load_snapshot(snapshot_id, root)
+    target.mkdir(parents=True, exist_ok=True)
+
+    written = []
+    for name, digest in snapshot["files"].items():
+        if digest is None:
+            continue
+        payload = _get_object(root, digest)
+        if name == "config.json":
+            config = json.loads(payload)
+            config["storage"] = "json"
+            payload = json.dumps(config).encode("utf-8")
+        fileManager.write_atomic(target / name, payload)
+        written.append(name)
+
+    fmt = snapshot["format"]
+    if fmt["binary"]:
+        payload = vaultFormat.serialize(data, fmt["cipher"])
+    else:
+        payload = json.dumps(data, indent=4).encode("utf-8")
+    fileManager.write_atomic(target / "password.json", payload)
+    # the sidecar index describes the file that was just replaced
+    (target / "password.json.idx").unlink(missing_ok=True)
+    written.append("password.json")
+    return {"ok": True, "id": snapshot["id"], "sites": len(data), "files": written}
+
+
+def _retained(ids: list[str], times: dict[str, float], now: float) -> set[str]:
+    keep = set(ids[-KEEP_LAST:])
+    for period, count in ((3600, KEEP_HOURLY), (86400, KEEP_DAILY), (7 * 86400, KEEP_WEEKLY)):
+        newest: dict[int, str] = {}
+        for snapshot_id in ids:
+            age = int((now - times[snapshot_id]) // period)
+            if 0 <= age < count:
+                # ids are in time order, so the last one seen per slot is its newest
+                newest[age] = snapshot_id
+        keep.update(newest.values())
+    return keep
+
+
+def prune(root: Path = BACKUP_DIR, now: float | None = None) -> int:
+    """Drop snapshots outside the retention policy and the blobs only they used.
+
+    A dropped record's changes are folded into the next kept snapshot, so
+    every kept snapshot still rebuilds exactly. Returns the number dropped.
+    """
+    now = time.time() if now is None else now
+    with _lock:
+        ids = _snapshot_ids(root)
+        records = {snapshot_id: _read_snapshot(root, snapshot_id) for snapshot_id in ids}
+        keep = _retained(ids, {i: r["time"] for i, r in records.items()}, now)
+        dropped = [i for i in ids if i not in keep]
+        if not dropped:
+            return 0
+
+        # fold each run of dropped records into the kept record after it
+        pending: dict = {}
+        pending_full = False
+        for snapshot_id in ids:
+            snapshot = records[snapshot_id]
+            if snapshot_id not in keep:
+                if snapshot["full"]:
+                    pending, pending_full = {}, True
+                pending.update(snapshot["sites"])
+                continue
+            if pending or pending_full:
+                if snapshot["full"]:
+                    merged = snapshot["sites"]
+                else:
+                    merged = {**pending, **snapshot["sites"]}
+                    snapshot["full"] = snapshot["full"] or pending_full
+                if snapshot["full"]:
+                    merged = {site: digest for site, digest in merged.items() if digest is not None}
+                snapshot["sites"] = merged
+                _write_snapshot(root, snapshot)
+            pending, pending_full = {}, False
+
+        for snapshot_id in dropped:
+            (_snapshot_dir(root) / f"{snapshot_id}.json").unlink(missing_ok=True)
+            del records[snapshot_id]
+
+        _collect_garbage(root, records.values())
+        return len(dropped)
+
+
+def _collect_garbage(root: Path, records):
+    """Delete every blob that none of `records` refers to."""
+    used = set()
+    for snapshot in records:
+        used.update(digest for digest in snapshot["sites"].values() if digest is not None)
+        used.update(digest for digest in snapshot["files"].values() if digest is not None)
+    for path in (root / "objects").glob("*/*"):
+        if path.parent.name + path.name not in used:
+            path.unlink(missing_ok=True)
+    _file_hashes.clear()
+
+
+def replace_keys(config: dict, root: Path = BACKUP_DIR) -> int:
+    """Put `config`'s key fields (KEY_FIELDS) and the current salt.bin into every snapshot.
+
+    Called after a master password change: the data key stays the same,
+    so an old config.json left in a backup would still unwrap it with the
+    old password. The old blobs are deleted. Returns the snapshots changed.
+    """
+    with _lock:
+        _file_hashes.clear()
+        salt = _file_hash(root, "salt.bin", capture_files()["salt.bin"])
+        records = [_read_snapshot(root, snapshot_id) for snapshot_id in _snapshot_ids(root)]
+        # old config blob -> its rewritten hash (many snapshots share one)
+        rewritten: dict[str, str] = {}
+        changed = 0
+        for snapshot in records:
+            files = dict(snapshot["files"])
+            digest = files.get("config.json")
+            if digest is not None and digest not in rewritten:
+                stored = json.loads(_get_object(root, digest))
+                for field in KEY_FIELDS:
+                    stored.pop(field, None)
+                    if field in config:
+                        stored[field] = config[field]
+                rewritten[digest] = _put_object(root, json.dumps(stored).encode("utf-8"))
+            if digest is not None:
+                files["config.json"] = rewritten[digest]
+            if files.get("salt.bin") is not None:
+                files["salt.bin"] = salt
+            if files != snapshot["files"]:
+                snapshot["files"] = files
+                _write_snapshot(root, snapshot)
+                changed += 1
+        _collect_garbage(root, records)
+        return changed
+
+
+def purge(root: Path = BACKUP_DIR):
+    """Delete every snapshot and blob (e.g. when the vault is wiped)."""
+    global _latest
+    with _lock:
+        shutil.rmtree(root, ignore_errors=True)
+        _latest = None
+        _file_hashes.clear()
+        _file_contents.clear()
+
+
+def main(argv=None):
+    """python -m Functions.backup list | restore [ID] [--to DIR] | prune"""
+    parser = argparse.ArgumentParser(description="List, restore and prune VaultMLN backup snapshots.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="show every snapshot")
+    restore_cmd = commands.add_parser("restore", help="rebuild a snapshot (the newest by default)")
+    restore_cmd.add_argument("id", nargs="?")
+    restore_cmd.add_argument("--to", type=Path, help="directory to write the files to (default: the Data folder)")
+    commands.add_parser("prune", help="apply the retention policy now")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "list":
+            for info in list_snapshots():
+                stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(info["time"]))
+                print(f"{info['id']}  {stamp}  {'full' if info['full'] else 'delta'}  {info['sites']} sites")
+        elif args.command == "restore":
+            if args.to is None:
+                from Functions import manager
+                result = manager.restore_backup(args.id)
+            else:
+                result = restore(args.id, args.to)
+            print(f"Restored snapshot {result['id']}: {result['sites']} sites, {', '.join(result['files'])}")
+        else:
+            print(f"Pruned {prune()} snapshots")
+    except ValueError as e:
+        parser.exit(1, f"error: {e}\n")
+
+
+if __name__ == "__main__":
+    main()
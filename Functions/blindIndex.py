@@ -0,0 +1,80 @@
+# blindIndex.py
+# Keyed blind index of usernames: each JSON entry stores an HMAC of its normalized username as "h".
+#
+# The key is derived from the vault's data key (VaultSession.derive_subkey),
+# so the tags reveal nothing without the master password but let manager
+# find an entry by username by comparing tags instead of decrypting.
+# A tag only narrows the search: usernames that normalize alike share one,
+# so the candidates are decrypted and compared exactly before use.
+import hashlib
+import hmac
+import unicodedata
+import weakref
+
+KEY_INFO = b"VaultMLN username blind index v1"
+
+# Bytes of the HMAC-SHA256 kept per entry (hex encoded in the entry)
+TAG_SIZE = 16
+
+# session -> derived index key
+_keys = weakref.WeakKeyDictionary()
+
+
+def normalize_username(user: str | None) -> str:
+    """Return the form usernames are compared in: NFKC, trimmed and case-folded."""
+    return unicodedata.normalize("NFKC", user or "").strip().casefold()
+
+
+def _key(session) -> bytes:
+    key = _keys.get(session)
+    if key is None:
+        key = _keys[session] = session.derive_subkey(KEY_INFO)
+    return key
+
+
+def tag(session, user: str | None) -> str:
+    """Return the blind index tag of `user` under `session`'s vault key."""
+    digest = hmac.new(_key(session), normalize_username(user).encode("utf-8"), hashlib.sha256).digest()
+    return digest[:TAG_SIZE].hex()
+
+
+class TagIndex:
+    """Tag -> sites with an entry under that tag, kept in step with the vault by `add` and `remove`.
+
+    Entries without a tag (binary vault records) cannot be indexed; their
+    sites are returned by every lookup.
+    """
+
+    def __init__(self, sites=()):
+        self._sites: dict[str, set[str]] = {}
+        # site -> its tags, so removal needs no second look at the entries
+        self._tags: dict[str, set[str]] = {}
+        self._untagged: set[str] = set()
+        for site, entries in sites:
+            self.add(site, entries)
+
+    def __len__(self) -> int:
+        return len(self._tags.keys() | self._untagged)
+
+    def add(self, site: str, entries: list):
+        """Index `site` under the tags of `entries`, replacing what it was indexed under before."""
+        self.remove(site)
+        tags = {item["h"] for item in entries if isinstance(item, dict) and "h" in item}
+        if any(not isinstance(item, dict) or "h" not in item for item in entries):
+            self._untagged.add(site)
+        if tags:
+            self._tags[site] = tags
+            for value in tags:
+                self._sites.setdefault(value, set()).add(site)
+
+    def remove(self, site: str):
+        self._untagged.discard(site)
+        for value in self._tags.pop(site, ()):
+            sites = self._sites[value]
+            sites.discard(site)
+            if not sites:
+                del self._sites[value]
+
+    def lookup(self, value: str) -> list[str]:
+        """Return the sites that may have an entry under tag `value`: the tagged ones, then the untagged ones."""
+        return sorted(self._sites.get(value, ())) + sorted(self._untagged)
@@ -1,10 +1,10 @@
 # Functions/encrypt.py
 # This module provides functions to encrypt and decrypt messages using a symmetric key.
 from cryptography.fernet import Fernet, InvalidToken
-from pathlib import Path
-from typing import Optional
-from Functions.kdf import derive_key
-from Functions.salt import load_or_create_salt
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
+import os
+import threading
 
 
 def _key_path():
@@ -38,34 +38,65 @@ def ensure_key():
     return load_key()
 
 
-def get_fernet(master_password: str) -> Fernet:
-    """Return a Fernet instance derived from `master_password` and salt.
+# ---------- batch helpers ----------
 
-    `master_password` is required. Use `load_key()` only for migration.
+# Batches smaller than this are handled inline; the pool only pays off for bulk views.
+BATCH_THRESHOLD = 64
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    """Return the shared crypto worker pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="vault-crypto")
+        return _pool
+
+
+def _run_batch(func, items: list, workers: int | None) -> list:
+    """Apply `func` to every item, fanning out over the pool for large batches.
+
+    The `cryptography` primitives release the GIL, so chunks run in parallel.
+    """
+    if len(items) < BATCH_THRESHOLD or workers == 1:
+        return [func(item) for item in items]
+    workers = workers or os.cpu_count() or 1
+    size = -(-len(items) // workers)
+    chunks = [items[i:i + size] for i in range(0, len(items), size)]
+    results: list = []
+    for part in _get_pool().map(lambda chunk: [func(item) for item in chunk], chunks):
+        results.extend(part)
+    return results
+
+
+def encrypt_many(messages: Iterable[str], cipher: Fernet, workers: int | None = None) -> list[Optional[str]]:
+    """Encrypt every message with one `cipher`.
+
+    Returns tokens in input order. An item that cannot be encrypted yields
+    None instead of failing the whole batch.
+    """
+    def _one(message):
+        try:
+            return cipher.encrypt(message.encode()).decode("utf-8")
+        except (AttributeError, TypeError):
+            return None
+
+    return _run_batch(_one, list(messages), workers)
+
+
+def decrypt_many(tokens: Iterable[str], cipher: Fernet, workers: int | None = None) -> list[Optional[str]]:
+    """Decrypt every token with one `cipher`.
+
+    Returns plaintexts in input order. A missing, invalid or foreign token
+    yields None instead of failing the whole batch.
     """
-    if not master_password:
-        raise ValueError("master_password is required")
-    salt = load_or_create_salt()
-    key = derive_key(master_password, salt)
-    return Fernet(key)
-
-
-def encrypt_message(message: str, master_password: str) -> str:
-    """Encrypt `message` using a key derived from `master_password`."""
-    if not master_password:
-        raise ValueError("master_password is required for encryption")
-    f = get_fernet(master_password)
-    token = f.encrypt(message.encode())
-    return token.decode("utf-8")
-
-
-def decrypt_message(token: str, master_password: str) -> str:
-    """Decrypt `token` using a key derived from `master_password`."""
-    if not master_password:
-        raise ValueError("master_password is required for decryption")
-    f = get_fernet(master_password)
-    try:
-        plaintext = f.decrypt(token.encode())
-    except InvalidToken as exc:
-        raise ValueError("Decryption failed: invalid token or wrong master password") from exc
-    return plaintext.decode("utf-8")
+    def _one(token):
+        try:
+            return cipher.decrypt(token.encode()).decode("utf-8")
+        except (InvalidToken, AttributeError, TypeError, UnicodeDecodeError):
+            return None
+
+    return _run_batch(_one, list(tokens), workers)
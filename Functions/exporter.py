@@ -0,0 +1,299 @@
+# exporter.py
+# Streaming export of the vault: an encrypted portable archive, or plaintext CSV/JSON for moving to another manager.
+#
+# Rows come from manager.iter_credentials, which decrypts a small batch at
+# a time, and are written out chunk by chunk. The plaintext of the whole
+# vault is never held in memory at once, whatever the vault size.
+#
+# Archive layout (.vmlx, big-endian):
+#   "VMLX" | header length u32 | header (JSON: kdf params, salt, compression)
+#   chunk* : body length u32 | nonce (12 bytes) | AES-256-GCM ciphertext
+# Each chunk decrypts to compressed JSON lines of [site, user, password].
+# The associated data binds each chunk to the header, its index and whether
+# it is the last one, so chunks cannot be reordered, swapped or cut off.
+import argparse
+import base64
+import csv
+import getpass
+import gzip
+import hashlib
+import io
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import Iterator, TypedDict
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from Functions import kdf, manager, migrations, vaultConfig
+from Functions.session import VaultSession
+
+try:
+    # optional: faster and smaller than zlib when installed
+    import zstandard
+except ImportError:
+    zstandard = None
+
+FORMATS = ("archive", "csv", "json")
+ARCHIVE_MAGIC = b"VMLX"
+ARCHIVE_VERSION = 1
+ARCHIVE_SUFFIX = ".vmlx"
+NONCE_SIZE = 12
+LENGTH = struct.Struct(">I")
+CHUNK_AAD = struct.Struct(">QB")
+
+# Rows per archive chunk / per write of a plaintext export
+CHUNK_ROWS = 512
+
+CSV_HEADER = ("name", "url", "username", "password")
+
+
+class ExportResult(TypedDict):
+    ok: bool
+    rows: int
+    # entries that could not be decrypted and were left out
+    skipped: int
+    bytes: int
+    seconds: float
+
+
+def compressions() -> list[str]:
+    """Return the compression names usable with the installed packages."""
+    return ["none", "zlib"] + (["zstd"] if zstandard is not None else [])
+
+
+def format_for(path) -> str:
+    """Guess the export format from the file name (".vmlx", ".csv[.gz|.zst]", ".json[.gz|.zst]")."""
+    suffixes = [s.lower() for s in Path(path).suffixes]
+    if ARCHIVE_SUFFIX in suffixes:
+        return "archive"
+    if ".json" in suffixes:
+        return "json"
+    return "csv"
+
+
+def _compress(data: bytes, compression: str) -> bytes:
+    if compression == "zlib":
+        return zlib.compress(data, 6)
+    if compression == "zstd":
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+def _decompress(data: bytes, compression: str) -> bytes:
+    if compression == "zlib":
+        return zlib.decompress(data)
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("This archive needs the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def _check_compression(compression: str):
+    if compression not in compressions():
+        raise ValueError(f"Unsupported compression: {compression}")
+
+
+def _chunks(rows: Iterator[tuple], result: ExportResult) -> Iterator[list[tuple[str, str, str]]]:
+    """Group decryptable rows into lists of CHUNK_ROWS, counting the rest as skipped."""
+    chunk: list = []
+    for site, user, password in rows:
+        if password is None:
+            result["skipped"] += 1
+            continue
+        chunk.append((site, user, password))
+        if len(chunk) >= CHUNK_ROWS:
+            result["rows"] += len(chunk)
+            yield chunk
+            chunk = []
+    result["rows"] += len(chunk)
+    yield chunk
+
+
+def _archive_key(passphrase: str, header: dict) -> bytes:
+    salt = base64.b64decode(header["salt"])
+    return base64.urlsafe_b64decode(kdf.derive_key(passphrase, salt, header["kdf"]))
+
+
+def _write_archive(f, chunks, passphrase: str, compression: str, kdf_params: dict | None):
+    header = {
+        "format": "vaultmln-export",
+        "version": ARCHIVE_VERSION,
+        "cipher": "aes-256-gcm",
+        "compression": compression,
+        "kdf": kdf_params or kdf.calibrate(),
+        "salt": base64.b64encode(os.urandom(16)).decode("ascii"),
+    }
+    raw_header = json.dumps(header).encode("utf-8")
+    aead = AESGCM(_archive_key(passphrase, header))
+    header_digest = hashlib.sha256(raw_header).digest()
+    f.write(ARCHIVE_MAGIC + LENGTH.pack(len(raw_header)) + raw_header)
+
+    def seal(index: int, payload: bytes, last: bool):
+        nonce = os.urandom(NONCE_SIZE)
+        ct = aead.encrypt(nonce, payload, header_digest + CHUNK_AAD.pack(index, last))
+        f.write(LENGTH.pack(NONCE_SIZE + len(ct)) + nonce + ct)
+
+    index = 0
+    for chunk in chunks:
+        if chunk:
+            lines = "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in chunk)
+            seal(index, _compress(lines.encode("utf-8"), compression), False)
+            index += 1
+    # an empty final chunk marks the end, so a truncated archive is detected
+    seal(index, b"", True)
+
+
+def read_archive(path, passphrase: str) -> Iterator[tuple[str, str, str]]:
+    """Yield (site, user, password) from an encrypted archive, one chunk at a time.
+
+    Raises ValueError for a wrong passphrase or a damaged or truncated archive.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(ARCHIVE_MAGIC)) != ARCHIVE_MAGIC:
+            raise ValueError("Not a VaultMLN export archive")
+        try:
+            (header_len,) = LENGTH.unpack(f.read(LENGTH.size))
+            raw_header = f.read(header_len)
+            header = json.loads(raw_header)
+        except (struct.error, ValueError) as exc:
+            raise ValueError("Export archive header is damaged") from exc
+        if header.get("version") != ARCHIVE_VERSION:
+            raise ValueError(f"Unsupported export archive version: {header.get('version')}")
+        aead = AESGCM(_archive_key(passphrase, header))
+        header_digest = hashlib.sha256(raw_header).digest()
+        index = 0
+        while True:
+            head = f.read(LENGTH.size)
+            if len(head) < LENGTH.size:
+                raise ValueError("Export archive is truncated")
+            body = f.read(LENGTH.unpack(head)[0])
+            nonce, ct = body[:NONCE_SIZE], body[NONCE_SIZE:]
+            for last in (False, True):
+                try:
+                    payload = aead.decrypt(nonce, ct, header_digest + CHUNK_AAD.pack(index, last))
+                    break
+                except InvalidTag:
+                    continue
+            else:
+                raise ValueError("Wrong passphrase or damaged export archive")
+            if last:
+                return
+            for line in _decompress(payload, header["compression"]).decode("utf-8").splitlines():
+                site, user, password = json.loads(line)
+                yield site, user, password
+            index += 1
+
+
+def _open_plain(path, compression: str):
+    """Open `path` for binary writing through the requested compressor."""
+    if compression == "zlib":
+        return gzip.open(path, "wb")
+    raw = open(path, "wb")
+    if compression == "zstd":
+        return zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+    return raw
+
+
+def _write_csv(f, chunks):
+    text = io.TextIOWrapper(f, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow(CSV_HEADER)
+    for chunk in chunks:
+        writer.writerows((site, site, user, password) for site, user, password in chunk)
+    text.flush()
+    text.detach()
+
+
+def _write_json(f, chunks):
+    # the same layout as a Bitwarden export, so importer can read it back
+    f.write(b'{"encrypted": false, "items": [\n')
+    first = True
+    for chunk in chunks:
+        if not chunk:
+            continue
+        items = ",\n".join(json.dumps({"type": 1, "name": site, "login": {
+            "uris": [{"uri": site}], "username": user, "password": password}}) for site, user, password in chunk)
+        f.write((("" if first else ",\n") + items).encode("utf-8"))
+        first = False
+    f.write(b"\n]}\n")
+
+
+def export_vault(path, session: VaultSession, fmt: str | None = None, compression: str = "none",
+                 passphrase: str | None = None, kdf_params: dict | None = None) -> ExportResult:
+    """Export every entry to `path`.
+
+    `fmt` is "archive" (encrypted with `passphrase`), "csv" or "json"; None
+    picks it from the file name. `compression` is one of `compressions()`.
+    The file is written next to `path` and renamed into place when complete.
+    Raises ValueError for bad arguments.
+    """
+    start = time.perf_counter()
+    fmt = fmt or format_for(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    _check_compression(compression)
+    if fmt == "archive" and not passphrase:
+        raise ValueError("An encrypted archive needs a passphrase")
+
+    result: ExportResult = {"ok": True, "rows": 0, "skipped": 0, "bytes": 0, "seconds": 0.0}
+    path = Path(path)
+    tmp = path.with_name(path.name + ".part")
+    chunks = _chunks(manager.iter_credentials(session, CHUNK_ROWS), result)
+    try:
+        if fmt == "archive":
+            with open(tmp, "wb") as f:
+                _write_archive(f, chunks, passphrase, compression, kdf_params)
+        else:
+            with _open_plain(tmp, compression) as f:
+                (_write_csv if fmt == "csv" else _write_json)(f, chunks)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    result["bytes"] = path.stat().st_size
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def main(argv=None):
+    """Headless export: python -m Functions.exporter OUT [--format F] [--compress C]"""
+    parser = argparse.ArgumentParser(description="Export the VaultMLN vault.")
+    parser.add_argument("out", help="output file (.vmlx, .csv or .json, optionally .gz/.zst)")
+    parser.add_argument("--format", choices=FORMATS, help="defaults to the output file extension")
+    parser.add_argument("--compress", choices=compressions(), default="none")
+    args = parser.parse_args(argv)
+
+    config = vaultConfig.load_config()
+    if not config.get("hello"):
+        parser.exit(1, "error: no vault has been set up yet\n")
+    try:
+        session = VaultSession.unlock(getpass.getpass("Master password: "),
+                                      params=vaultConfig.get_kdf_params(config), wrapped_key=config.get("dek"))
+        session.check(config["hello"])
+    except ValueError as e:
+        parser.exit(1, f"error: {e}\n")
+    # the readers only understand the current schema; older entries would be skipped as unreadable
+    if migrations.pending(config):
+        print("Upgrading the vault to the current format first...", file=sys.stderr)
+        migrations.migrate(session, config)
+
+    fmt = args.format or format_for(args.out)
+    passphrase = None
+    if fmt == "archive":
+        passphrase = getpass.getpass("Archive passphrase: ")
+        if passphrase != getpass.getpass("Repeat passphrase: "):
+            parser.exit(1, "error: passphrases do not match\n")
+    else:
+        print("warning: the export will contain every password in plain text", file=sys.stderr)
+
+    result = export_vault(args.out, session, fmt, args.compress, passphrase)
+    print(f"Exported {result['rows']} entries ({result['bytes'] / 1e6:.2f} MB) in {result['seconds']:.2f} s"
+          + (f", {result['skipped']} unreadable entries left out" if result["skipped"] else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -111,8 +111,30 @@ def asset_path(relative_path: str) -> Path:
     return get_assets_dir() / relative_path
 
 
+def bundled_path(relative_path: str) -> Path:
+    """
+    Returns full path to a file inside the bundled 'assets/' folder (not the
+    AppData copy, which is only made on first run)
+    """
+    return _base_dir() / "assets" / relative_path
+
+
 def data_path(relative_path: str) -> Path:
     """
     Returns full path to a file inside AppData/Data
     """
     return get_data_dir() / relative_path
+
+
+def write_atomic(path: Path, payload: bytes):
+    """
+    Writes `payload` to a sibling temp file, fsyncs it and renames it over
+    `path`, so readers see either the old file or the new one, never half of it
+    """
+    path = Path(path)
+    tmp = path.with_name(path.name + ".part")
+    with open(tmp, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
@@ -0,0 +1,210 @@
+# importer.py
+# Bulk import of Chrome, Firefox, Bitwarden (CSV or JSON) and generic CSV password exports.
+#
+# The source is read row by row and imported in batches: each batch is
+# de-duplicated against the vault, encrypted on the worker pool
+# (encrypt.encrypt_many) and staged in one manager.transaction, which is
+# written to disk once at the end.
+import csv
+import json
+import re
+import time
+from typing import Iterator, TypedDict
+from Functions import manager, siteIdentity
+from Functions.session import VaultSession
+
+# Rows encrypted and staged together
+BATCH_SIZE = 500
+
+# Column names per field, in order of preference. These cover Chrome
+# (name,url,username,password), Firefox (url,username,password,...) and
+# Bitwarden (name,login_uri,login_username,login_password,...) CSV exports.
+SITE_COLUMNS = ("url", "login_uri", "origin", "website", "site", "name", "title")
+USER_COLUMNS = ("username", "login_username", "user", "login", "email")
+PASSWORD_COLUMNS = ("password", "login_password", "pass")
+
+_JSON_CHUNK = 64 * 1024
+
+# Top-level flag of a Bitwarden export whose items are encrypted cipher strings
+_ENCRYPTED_FLAG = re.compile(r'"encrypted"\s*:\s*true')
+
+
+class ImportResult(TypedDict):
+    ok: bool
+    rows: int
+    imported: int
+    duplicates: int
+    conflicts: int
+    invalid: int
+    seconds: float
+    rows_per_sec: float
+    # site -> rows skipped for that site (duplicates and conflicts)
+    skipped: dict
+
+
+def normalize_site(value: str) -> str:
+    """Turn a URL or site name into the bare host used as the vault key ("https://www.Example.com/login" -> "example.com").
+
+    Values that are not URLs (e.g. "My Bank") are only trimmed.
+    """
+    value = (value or "").strip()
+    return siteIdentity.host_of(value) or value
+
+
+def _pick(row: dict, columns: tuple) -> str:
+    for column in columns:
+        value = row.get(column)
+        if value:
+            return value.strip() if column in SITE_COLUMNS else value
+    return ""
+
+
+def _csv_rows(f) -> Iterator[tuple[str, str, str]]:
+    reader = csv.DictReader(f)
+    # match headers case-insensitively ("URL", "Username" in some exports)
+    reader.fieldnames = [(name or "").strip().lower() for name in reader.fieldnames or []]
+    for row in reader:
+        yield _pick(row, SITE_COLUMNS), _pick(row, USER_COLUMNS), _pick(row, PASSWORD_COLUMNS)
+
+
+def _json_items(f) -> Iterator[dict]:
+    """Yield the objects of the top-level "items" array one at a time, reading the file in chunks."""
+    decoder = json.JSONDecoder()
+    buf = ""
+    eof = False
+
+    def more() -> bool:
+        nonlocal buf, eof
+        chunk = f.read(_JSON_CHUNK)
+        eof = not chunk
+        buf += chunk
+        return not eof
+
+    def check_encrypted(text: str):
+        if _ENCRYPTED_FLAG.search(text):
+            raise ValueError("The export is encrypted; export it again unencrypted (JSON or CSV) to import it")
+
+    # find the start of the array; Bitwarden writes "encrypted" before it
+    while True:
+        key = buf.find('"items"')
+        bracket = buf.find("[", key) if key != -1 else -1
+        if bracket != -1:
+            check_encrypted(buf[:key])
+            buf = buf[bracket + 1:]
+            break
+        if not more():
+            check_encrypted(buf)
+            raise ValueError('JSON export has no "items" array')
+
+    while True:
+        pos = 0
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        buf = buf[pos:]
+        if not buf:
+            if not more():
+                raise ValueError("JSON export is truncated")
+            continue
+        if buf[0] == "]":
+            # a flag after the array still aborts the import before anything is written
+            while more():
+                pass
+            check_encrypted(buf[1:])
+            return
+        try:
+            item, end = decoder.raw_decode(buf)
+        except ValueError:
+            if not more():
+                raise
+            continue
+        buf = buf[end:]
+        yield item
+
+
+def _json_rows(f) -> Iterator[tuple[str, str, str]]:
+    """Rows of a Bitwarden JSON export; only login items (type 1) have credentials."""
+    for item in _json_items(f):
+        login = item.get("login") if isinstance(item, dict) else None
+        if not login:
+            continue
+        uris = login.get("uris") or []
+        site = next((u.get("uri") for u in uris if u.get("uri")), None) or item.get("name") or ""
+        yield site, login.get("username") or "", login.get("password") or ""
+
+
+def read_rows(path) -> Iterator[tuple[str, str, str]]:
+    """Yield (site, username, password) from the export at `path`. The format is detected from the content."""
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        head = f.read(1)
+        while head.isspace():
+            head = f.read(1)
+        f.seek(0)
+        if head.startswith("{"):
+            yield from _json_rows(f)
+        else:
+            yield from _csv_rows(f)
+
+
+def import_file(path, session: VaultSession, progress=None, batch_size: int = BATCH_SIZE) -> ImportResult:
+    """Import every credential of the export at `path` into the vault in one write.
+
+    Site names are normalized (see `normalize_site`). A row is skipped as a
+    duplicate if the site already has the same username and password, and
+    as a conflict if it has the username with another password (the stored
+    one is kept). Rows without a site or password are counted as invalid.
+    `progress(rows_read)` is called after every batch.
+    Raises ValueError if the file cannot be parsed or is an encrypted export;
+    nothing is written then.
+    """
+    start = time.perf_counter()
+    result: ImportResult = {"ok": True, "rows": 0, "imported": 0, "duplicates": 0, "conflicts": 0,
+                            "invalid": 0, "seconds": 0.0, "rows_per_sec": 0.0, "skipped": {}}
+    # site -> {username: password} of everything in the vault or staged so far
+    known: dict[str, dict[str, str]] = {}
+
+    with manager.transaction(session) as tx:
+        batch: list[tuple[str, str, str]] = []
+
+        def stage():
+            if batch:
+                tx.put_many(batch)
+                result["imported"] += len(batch)
+                batch.clear()
+            if progress:
+                progress(result["rows"])
+
+        for raw_site, user, password in read_rows(path):
+            result["rows"] += 1
+            site = normalize_site(raw_site)
+            if not site or not password:
+                result["invalid"] += 1
+                continue
+            users = known.get(site)
+            if users is None:
+                users = known[site] = {c[0]: c[1] for c in tx.credentials(site) if c is not None}
+            if user in users:
+                result["duplicates" if users[user] == password else "conflicts"] += 1
+                result["skipped"][site] = result["skipped"].get(site, 0) + 1
+                continue
+            users[user] = password
+            batch.append((site, user, password))
+            if len(batch) >= batch_size:
+                stage()
+        stage()
+
+    result["seconds"] = time.perf_counter() - start
+    result["rows_per_sec"] = result["rows"] / result["seconds"] if result["seconds"] else 0.0
+    return result
+
+
+def summary(result: ImportResult) -> str:
+    """Return a short human-readable report of an import."""
+    lines = [
+        f"Imported {result['imported']} of {result['rows']} rows ({result['rows_per_sec']:,.0f} rows/s).",
+        f"Skipped {result['duplicates']} duplicates and {result['conflicts']} conflicting entries, "
+        f"{result['invalid']} invalid rows.",
+    ]
+    top = sorted(result["skipped"].items(), key=lambda kv: -kv[1])[:5]
+    if top:
+        lines.append("Most skipped: " + ", ".join(f"{site} ({n})" for site, n in top))
+    return "\n".join(lines)
@@ -0,0 +1,178 @@
+# journal.py
+# Log-structured storage mode: mutations append to a journal, and compaction folds it back into password.json.
+#
+# Every journal line replaces or removes whole sites, so replaying a line
+# twice is harmless. That keeps crash recovery simple: state is always
+# "snapshot, then the journal being compacted (if any), then the live journal".
+import json
+import os
+import threading
+from Functions import fileManager
+
+SNAPSHOT_FILE = fileManager.data_path("password.json")
+JOURNAL_FILE = fileManager.data_path("password.journal")
+# The journal is renamed to this while a compaction writes the new snapshot
+COMPACTING_FILE = fileManager.data_path("password.journal.compacting")
+
+# Journal records that trigger a background compaction
+COMPACT_AFTER = 500
+
+_lock = threading.Lock()
+_records = 0
+# Replayed vault state, kept up to date by every append so a write never re-reads the files
+_state: dict | None = None
+# Thread folding the journal into password.json (a background one, or a caller of compact(wait=True))
+_compactor: threading.Thread | None = None
+# Notified, under _lock, whenever a compaction finishes
+_compacted = threading.Condition(_lock)
+
+
+def _read_snapshot() -> dict:
+    if not SNAPSHOT_FILE.exists():
+        return {}
+    return json.loads(SNAPSHOT_FILE.read_bytes() or b"{}") or {}
+
+
+def _replay_record(data: dict, record: dict):
+    if record.get("op") == "put":
+        data[record["site"]] = record["entries"]
+    elif record.get("op") == "del":
+        data.pop(record["site"], None)
+    elif record.get("op") == "batch":
+        for site, entries in record["sites"].items():
+            if entries is None:
+                data.pop(site, None)
+            else:
+                data[site] = entries
+
+
+def _replay(path, data: dict, repair: bool = False) -> int:
+    """Apply the records in `path` to `data` and return how many were applied.
+
+    A torn last line (crash mid-append) is ignored; with `repair` it is also
+    cut off so the next append starts on a clean line.
+    """
+    if not path.exists():
+        return 0
+    applied = 0
+    good = 0
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            _replay_record(data, record)
+            applied += 1
+            good += len(line)
+    if repair and good != path.stat().st_size:
+        with open(path, "r+b") as f:
+            f.truncate(good)
+    return applied
+
+
+def load() -> dict:
+    """Return the vault state: snapshot plus every journal record.
+
+    The files are replayed once; afterwards the state is kept in memory and
+    each call returns a shallow copy of it.
+    """
+    global _records, _state
+    with _lock:
+        if _state is None:
+            data = _read_snapshot()
+            _replay(COMPACTING_FILE, data)
+            _records = _replay(JOURNAL_FILE, data, repair=True)
+            _state = data
+        return dict(_state)
+
+
+def reset():
+    """Forget the in-memory state, e.g. after password.json was rewritten directly."""
+    global _state
+    with _lock:
+        _state = None
+
+
+def _append(record: dict):
+    global _records
+    line = json.dumps(record, separators=(",", ":")) + "\n"
+    with _lock:
+        JOURNAL_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(JOURNAL_FILE, "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        if _state is not None:
+            _replay_record(_state, record)
+        _records += 1
+        due = _records >= COMPACT_AFTER
+    if due:
+        compact()
+
+
+def put_site(site: str, entries: list):
+    """Record that `site` now holds exactly `entries`."""
+    _append({"op": "put", "site": site, "entries": entries})
+
+
+def delete_site(site: str):
+    """Record that `site` was removed."""
+    _append({"op": "del", "site": site})
+
+
+def apply_sites(changes: dict):
+    """Record several site changes ({site: entries, or None to remove}) as one all-or-nothing line."""
+    if changes:
+        _append({"op": "batch", "sites": changes})
+
+
+def _fold():
+    """Write snapshot + compacting journal as the new snapshot, then drop the compacting journal."""
+    global _compactor
+    try:
+        with _lock:
+            data = _read_snapshot()
+            _replay(COMPACTING_FILE, data)
+        fileManager.write_atomic(SNAPSHOT_FILE, json.dumps(data, indent=4).encode("utf-8"))
+        COMPACTING_FILE.unlink(missing_ok=True)
+    finally:
+        with _lock:
+            if _compactor is threading.current_thread():
+                _compactor = None
+            _compacted.notify_all()
+
+
+def compact(wait: bool = False):
+    """Fold the journal into password.json.
+
+    The live journal is renamed aside under the lock, so new appends go to a
+    fresh journal while the snapshot is rewritten on a background thread.
+    With `wait`, the compaction runs on the calling thread instead.
+    """
+    global _records, _compactor
+    with _lock:
+        if _compactor is not None:
+            return
+        if COMPACTING_FILE.exists():
+            # an earlier compaction was interrupted: finish that one first
+            pass
+        elif JOURNAL_FILE.exists():
+            JOURNAL_FILE.replace(COMPACTING_FILE)
+            _records = 0
+        else:
+            return
+        if not wait:
+            _compactor = threading.Thread(target=_fold, daemon=True, name="vault-compactor")
+            _compactor.start()
+            return
+        # claimed before the lock is released, so no second fold of the same journal starts
+        _compactor = threading.current_thread()
+    _fold()
+
+
+def wait_for_compaction():
+    """Block until a running compaction (on any other thread) has finished."""
+    with _lock:
+        while _compactor is not None and _compactor is not threading.current_thread():
+            _compacted.wait()
@@ -1,21 +1,119 @@
 # Functions/kdf.py
-# This module provides a key derivation function to derive a symmetric key from a master password and salt.
+# This module provides key derivation functions to derive a symmetric key from a master password and salt.
+# KDFs are looked up by name so the algorithm and its cost can be stored with the vault and tuned per machine.
+import os
+import time
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.backends import default_backend
 from base64 import urlsafe_b64encode
 
+try:
+    # Argon2id needs cryptography >= 44; older installs fall back to scrypt.
+    from cryptography.hazmat.primitives.kdf.argon2 import Argon2id
+except ImportError:
+    Argon2id = None
 
-def derive_key(master_password: str, salt: bytes) -> bytes:
-    """Derive a URL-safe base64-encoded 32-byte key for Fernet.
+# Parameters every vault created before the KDF was stored in config.json uses.
+LEGACY_PARAMS = {"name": "pbkdf2", "iterations": 390000}
 
-    This uses PBKDF2-HMAC-SHA256 with a high iteration count.
-    """
+# Default unlock latency `calibrate()` aims for.
+TARGET_MS = 300
+
+
+def _pbkdf2(password: bytes, salt: bytes, iterations: int = 390000) -> bytes:
     kdf = PBKDF2HMAC(
         algorithm=hashes.SHA256(),
         length=32,
         salt=salt,
-        iterations=390000,
+        iterations=iterations,
         backend=default_backend(),
     )
-    return urlsafe_b64encode(kdf.derive(master_password.encode()))
+    return kdf.derive(password)
+
+
+def _scrypt(password: bytes, salt: bytes, n: int = 2 ** 15, r: int = 8, p: int = 1) -> bytes:
+    return Scrypt(salt=salt, length=32, n=n, r=r, p=p).derive(password)
+
+
+def _argon2id(password: bytes, salt: bytes, iterations: int = 3, memory_cost: int = 65536, lanes: int = 4) -> bytes:
+    return Argon2id(salt=salt, length=32, iterations=iterations, lanes=lanes, memory_cost=memory_cost).derive(password)
+
+
+# name -> function(password_bytes, salt, **params) returning 32 raw key bytes
+KDFS = {
+    "pbkdf2": _pbkdf2,
+    "scrypt": _scrypt,
+}
+if Argon2id is not None:
+    KDFS["argon2id"] = _argon2id
+
+
+def available_kdfs() -> list[str]:
+    """Return the names of the KDFs usable with the installed cryptography."""
+    return list(KDFS)
+
+
+def default_kdf() -> str:
+    """Return the preferred KDF for new vaults (Argon2id when available)."""
+    return "argon2id" if "argon2id" in KDFS else "scrypt"
+
+
+def derive_key(master_password: str, salt: bytes, params: dict | None = None) -> bytes:
+    """Derive a URL-safe base64-encoded 32-byte key for Fernet.
+
+    `params` is the KDF record stored in config.json, e.g.
+    {"name": "scrypt", "n": 32768, "r": 8, "p": 1}. When omitted the legacy
+    PBKDF2-HMAC-SHA256 with 390,000 iterations is used so older vaults keep opening.
+    """
+    params = dict(params or LEGACY_PARAMS)
+    name = params.pop("name", "pbkdf2")
+    func = KDFS.get(name)
+    if func is None:
+        raise ValueError(f"Unknown or unavailable KDF: {name!r}")
+    return urlsafe_b64encode(func(master_password.encode(), salt, **params))
+
+
+def _time_derive(params: dict, salt: bytes, runs: int = 2) -> float:
+    """Return the fastest of `runs` derivations (the first one pays warm-up costs)."""
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        derive_key("calibration", salt, params)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def calibrate(name: str | None = None, target_ms: int = TARGET_MS) -> dict:
+    """Pick parameters for `name` that take roughly `target_ms` on this machine.
+
+    Times one cheap derivation and scales the cost parameter linearly, which
+    holds for all three KDFs. Returns a params dict ready for `derive_key`.
+    """
+    name = name or default_kdf()
+    if name not in KDFS:
+        raise ValueError(f"Unknown or unavailable KDF: {name!r}")
+    salt = os.urandom(16)
+    target = target_ms / 1000.0
+
+    if name == "pbkdf2":
+        probe = {"name": "pbkdf2", "iterations": 50000}
+        scale = target / max(_time_derive(probe, salt), 1e-6)
+        # never go below the original hard-coded cost
+        return {"name": "pbkdf2", "iterations": max(LEGACY_PARAMS["iterations"], int(probe["iterations"] * scale))}
+
+    if name == "scrypt":
+        # n must be a power of two; memory use is 128 * n * r bytes, so cap n at 2**18 (256 MiB)
+        probe = {"name": "scrypt", "n": 2 ** 14, "r": 8, "p": 1}
+        scale = target / max(_time_derive(probe, salt), 1e-6)
+        log_n = 14
+        while log_n < 18 and 2 ** (log_n + 1) <= 2 ** 14 * scale:
+            log_n += 1
+        return {"name": "scrypt", "n": 2 ** log_n, "r": 8, "p": 1}
+
+    # argon2id: fixed 64 MiB, one lane per core (up to 4), tune the pass count
+    lanes = max(1, min(4, os.cpu_count() or 1))
+    probe = {"name": "argon2id", "iterations": 1, "memory_cost": 65536, "lanes": lanes}
+    scale = target / max(_time_derive(probe, salt), 1e-6)
+    return {"name": "argon2id", "iterations": max(2, round(scale)), "memory_cost": 65536, "lanes": lanes}
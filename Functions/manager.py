@@ -1,13 +1,20 @@
 # manager.py
-# A simple password manager that stores encrypted credentials in a JSON file.
-from pathlib import Path
+# A simple password manager that stores encrypted credentials through a storage engine (password.json by default, see storage).
+import atexit
+from concurrent.futures import ThreadPoolExecutor
 import json
 from typing import Dict
 import logging
-from typing import TypedDict
+from typing import Iterator, TypedDict
+from Functions import backup
+from Functions import blindIndex
 from Functions import encrypt
-from Functions.salt import load_or_create_salt
 from Functions import fileManager
+from Functions import siteIdentity
+from Functions import storage
+from Functions import vaultConfig
+from Functions import vaultFormat
+from Functions.session import VaultSession
 
 logger = logging.getLogger(__name__)
 
@@ -15,90 +22,485 @@ DATA_DIR = fileManager.get_data_dir()
 PASSWORD_FILE = fileManager.data_path("password.json")
 
 
-def _ensure_key(master_password: str | None = None):
-    """Ensure required crypto material exists.
+def _require_session(session: VaultSession | None):
+    """Raise ValueError unless the vault has been unlocked."""
+    if session is None:
+        raise ValueError("An unlocked VaultSession is required")
 
-    If `master_password` is provided, ensure salt exists. Otherwise ensure
-    the legacy file-based key exists (for backward compatibility).
+
+def encrypt_message(message: str, session: VaultSession) -> str:
+    _require_session(session)
+    return session.encrypt(message)
+
+
+def decrypt_message(token: str, session: VaultSession) -> str:
+    _require_session(session)
+    return session.decrypt(token)
+
+
+# ---------- entry format ----------
+# v2: {"v": 2, "data": <token of {"u": user, "p": password, ...}>, "h": <blind index tag of user>}
+# v3: {"v": 3, "nonce": <bytes>, "ct": <bytes>}  (records of a binary vault, see vaultFormat)
+# Every site maps to a list of entries. Older layouts (a bare entry dict,
+# v1 two-token entries) are upgraded once at unlock by `migrations`; the
+# readers below only handle the current schema.
+
+ENTRY_VERSION = 2
+
+
+def _entry_version(item) -> int:
+    return item.get("v", 1)
+
+
+def _record_plain(user: str, password: str) -> str:
+    return json.dumps({"u": user, "p": password}, separators=(",", ":"))
+
+
+def _binary_aead(session: VaultSession):
+    """Return the record cipher if the vault is in the binary format, or None for JSON entries."""
+    engine = _storage()
+    if not engine.is_binary():
+        return None
+    return vaultFormat.make_aead(session, engine.cipher_id())
+
+
+def _encode_entry(site: str, user: str, password: str, session: VaultSession, aead=None) -> dict:
+    """Return a new entry: a binary vault record when `aead` is given, else a v2 JSON entry.
+
+    Both hold one ciphertext over a compact record, leaving room for more fields.
     """
-    if master_password:
-        try:
-            load_or_create_salt()
-        except Exception as e:
-            logger.exception("Failed to create/load salt: %s", e)
-            raise
-        return
+    if aead is not None:
+        return vaultFormat.seal(aead, site, _record_plain(user, password))
+    return {"v": ENTRY_VERSION, "data": session.encrypt(_record_plain(user, password)),
+            "h": blindIndex.tag(session, user)}
+
+
+def _encode_entries(rows: list[tuple[str, str, str]], session: VaultSession, aead=None) -> list[dict]:
+    """Encode many (site, user, password) rows like `_encode_entry`, encrypting JSON entries as one batch."""
+    if aead is not None:
+        return [_encode_entry(site, user, password, session, aead) for site, user, password in rows]
+    tokens = encrypt.encrypt_many([_record_plain(user, password) for _, user, password in rows], session.fernet)
+    return [{"v": ENTRY_VERSION, "data": token, "h": blindIndex.tag(session, user)}
+            for token, (_, user, _) in zip(tokens, rows)]
+
+
+def _label_token(item):
+    """Return the ciphertext that holds the username of `item` (nonce + ciphertext bytes for v3)."""
+    if item.get("v") == vaultFormat.ENTRY_VERSION:
+        return bytes(item["nonce"]) + bytes(item["ct"])
+    return item.get("data")
+
+
+def _parse_record(plain: str | None) -> dict | None:
     try:
-        encrypt.load_key()
-    except Exception:
-        encrypt.ensure_key()
+        record = json.loads(plain)
+        return record if isinstance(record, dict) and "u" in record and "p" in record else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _username_from_plain(plain: str | None) -> str | None:
+    """Return the username inside a decrypted record."""
+    record = _parse_record(plain)
+    return record["u"] if record else None
+
+
+def _decrypt_entries(pairs: list[tuple[str, dict]], session: VaultSession, aead=None) -> list[tuple[str, str] | None]:
+    """Decrypt (site, entry) pairs in one batch.
+
+    Returns (user, password) per entry, or None where it cannot be decrypted.
+    """
+    plain = iter(encrypt.decrypt_many(
+        [item.get("data") for _, item in pairs if item.get("v") != vaultFormat.ENTRY_VERSION], session.fernet))
+    results: list = []
+    for site, item in pairs:
+        if item.get("v") == vaultFormat.ENTRY_VERSION:
+            if aead is None:
+                aead = _binary_aead(session)
+            record = _parse_record(vaultFormat.open_entry(aead, site, item)) if aead else None
+        else:
+            record = _parse_record(next(plain))
+        results.append((record["u"], record["p"]) if record else None)
+    return results
+
+
+def _username_matches(site: str, entries: list, username: str, session: VaultSession, aead=None) -> list[int]:
+    """Return the positions of the entries of `site` whose username is exactly `username`.
+
+    The blind index tag ("h") only narrows the candidates: usernames that
+    normalize alike ("Bob", " bob ") share a tag but are separate entries.
+    Candidates and entries without a tag (binary vault records) are decrypted
+    and compared; entries that cannot be decrypted never match.
+    """
+    wanted = blindIndex.tag(session, username)
+    candidates = [i for i, item in enumerate(entries) if item.get("h", wanted) == wanted]
+    if not candidates:
+        return []
+    decrypted = _decrypt_entries([(site, entries[i]) for i in candidates], session, aead)
+    return [i for i, creds in zip(candidates, decrypted) if creds is not None and creds[0] == username]
 
 
-def encrypt_message(message: str, master_password: str) -> str:
-    _ensure_key(master_password)
-    return encrypt.encrypt_message(message, master_password)
+# Storage engine picked by config.json, opened on first use (see set_storage_mode)
+_engine = None
 
+# Identity key -> stored site names (see siteIdentity), built from the site
+# names on first lookup and kept up to date by every write after that
+_site_index: siteIdentity.SiteIndex | None = None
 
-def decrypt_message(token: str, master_password: str) -> str:
-    _ensure_key(master_password)
-    return encrypt.decrypt_message(token, master_password)
+# Blind index tag -> sites with an entry under it (see find_username), kept like _site_index
+_tag_index: blindIndex.TagIndex | None = None
+
+
+def _storage():
+    global _engine
+    if _engine is None:
+        _engine = storage.open_storage(vaultConfig.get_storage_mode(vaultConfig.load_config()))
+    return _engine
 
 
 def _read_password_file() -> Dict:
     DATA_DIR.mkdir(parents=True, exist_ok=True)
-    if not PASSWORD_FILE.exists():
-        PASSWORD_FILE.write_text("{}")
-        return {}
+    return _storage().load()
+
+
+def _write_password_file(data: Dict, binary: bool | None = None, cipher_id: int | None = None):
+    """Write the vault. `binary=None` keeps whichever format is currently on disk."""
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    _storage().write_all(data, binary=binary, cipher_id=cipher_id)
+    _reset_indexes()
+    _backup(data, full=True)
+
+
+def _sites():
+    global _site_index
+    if _site_index is None:
+        _site_index = siteIdentity.SiteIndex(_storage().site_names())
+    return _site_index
+
+
+def _tags():
+    global _tag_index
+    if _tag_index is None:
+        _tag_index = blindIndex.TagIndex(_read_password_file().items())
+    return _tag_index
+
+
+def _reset_indexes():
+    global _site_index, _tag_index
+    _site_index = _tag_index = None
+
+
+def _index_changes(changes: dict):
+    for site, entries in changes.items():
+        if entries:
+            if _site_index is not None:
+                _site_index.add(site)
+            if _tag_index is not None:
+                _tag_index.add(site, entries)
+        else:
+            if _site_index is not None:
+                _site_index.remove(site)
+            if _tag_index is not None:
+                _tag_index.remove(site)
+
+
+# Backup snapshots are taken on this one thread, in commit order, so a
+# commit returns without waiting for their writes and fsyncs
+_backups = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vault-backup")
+
+# True once a full snapshot has been queued, so later commits only send their changes
+_full_backup_queued = False
+
+
+def _backup(changes: dict, full: bool = False):
+    """Queue a backup snapshot of a commit (see backup). A failed backup is logged, never raised.
+
+    Everything the snapshot holds (the entries, the format, config.json
+    and salt.bin) is taken here, as of the commit; the backup thread only
+    hashes and writes it.
+    """
+    global _full_backup_queued
+    engine = _storage()
+    binary, cipher_id = engine.is_binary(), engine.cipher_id()
+    if not full and not _full_backup_queued and not backup.has_full_snapshot():
+        # the first snapshot holds the whole vault, as this commit left it
+        changes, full = engine.load(), True
+    # a copy of the mapping; entry lists are replaced by later commits, not changed in place
+    args = (dict(changes), full, binary, cipher_id, backup.capture_files())
+    _full_backup_queued = _full_backup_queued or full
+    try:
+        _backups.submit(_record_backup, *args)
+    except RuntimeError:
+        # the interpreter is shutting down and the backup thread is gone
+        _record_backup(*args)
+
+
+def _record_backup(changes: dict, full: bool, binary: bool, cipher_id: int, files: dict):
+    global _full_backup_queued
+    try:
+        backup.record(changes, binary, cipher_id, full=full, files=files)
+    except (OSError, ValueError) as exc:
+        logger.warning("Backup snapshot failed: %s", exc)
+        if not backup.has_full_snapshot():
+            # the full snapshot was lost; the next commit queues another one
+            _full_backup_queued = False
+
+
+def _wait_for_backups(task=None, *args):
+    """Block until every queued snapshot is written; then run `task(*args)` on the backup thread, if given."""
     try:
-        with open(PASSWORD_FILE, "r", encoding="utf-8") as f:
-            return json.load(f) or {}
-    except json.JSONDecodeError:
-        # backup corrupted file
-        backup = PASSWORD_FILE.with_name("password_backup.json")
-        PASSWORD_FILE.replace(backup)
-        PASSWORD_FILE.write_text("{}")
-        return {}
+        future = _backups.submit(task or (lambda: None), *args)
+    except RuntimeError:
+        # at interpreter exit the backup thread has already finished its queue
+        return task(*args) if task is not None else None
+    return future.result()
+
+
+def rewrap_backups(config: dict) -> int:
+    """After a master password change, give every backup snapshot `config`'s wrapped key (see backup.replace_keys).
+
+    Otherwise the data key, which a password change keeps, could still be
+    unwrapped from a backup with an old password. Returns the snapshots changed.
+    """
+    return _wait_for_backups(backup.replace_keys, config)
+
+
+def cache_stats() -> storage.CacheStats | None:
+    """Return hit/miss/reload counters of the password.json cache (None for engines without one)."""
+    engine = _storage()
+    if type(engine) is not storage.FileStorage:
+        return None
+    return dict(engine.stats)
+
+
+def flush():
+    """Write any unsaved changes of the storage engine, and any queued backup snapshots, to disk now."""
+    if _engine is not None:
+        _engine.flush()
+    _wait_for_backups()
+
+
+atexit.register(flush)
+
+
+def restore_backup(snapshot_id: str | None = None) -> backup.RestoreResult:
+    """Replace the vault with a backup snapshot (the newest if `snapshot_id` is None).
+
+    password.json, config.json and salt.bin are rewritten and the "json"
+    storage engine is selected. The restored config.json may hold another
+    master password, so the vault has to be unlocked again afterwards.
+    Raises ValueError if the snapshot is unknown or damaged.
+    """
+    global _engine
+    flush()
+    if _engine is not None:
+        _engine.close()
+        _engine = None
+    _reset_indexes()
+    return _wait_for_backups(backup.restore, snapshot_id)
+
+
+def wipe_vault():
+    """Remove every stored entry, keeping the current storage mode and file format.
+
+    The backup snapshots are deleted too, so wiped entries cannot be restored from them.
+    """
+    global _full_backup_queued
+    _wait_for_backups(backup.purge)
+    _full_backup_queued = False
+    _write_password_file({})
+
+
+def set_storage_mode(mode: str) -> int:
+    """Move the vault to another storage engine and make it the default.
+
+    Modes are the keys of `storage.ENGINES`: "json" (password.json,
+    rewritten on every change), "journal" (password.json plus an
+    append-only journal) and "sqlite" (Data/password.db). Every site is
+    copied into the new engine and then removed from the old one, except
+    between "json" and "journal", which share password.json.
+    Raises ValueError for an unknown mode, or when a binary vault would
+    leave the "json" engine. Returns the number of sites in the vault.
+    """
+    global _engine
+    current = _storage()
+    target = storage.open_storage(mode)
+    if target.name == current.name:
+        return 0
+    if current.is_binary():
+        raise ValueError("Convert the binary vault back to JSON before changing the storage engine")
+
+    data = current.load()
+    shared_file = isinstance(current, storage.FileStorage) and isinstance(target, storage.FileStorage)
+    if shared_file:
+        # journal -> json folds the journal; json -> journal needs nothing
+        current.close()
+    else:
+        target.write_all(data)
+        # the copy must be on disk before the source is emptied
+        target.flush()
+        current.write_all({})
+        current.close()
+
+    config = vaultConfig.load_config()
+    config["storage"] = target.name
+    vaultConfig.save_config(config)
+    _engine = target
+    return len(data)
+
+
+def reshard(count: int) -> int:
+    """Redistribute a sharded vault over `count` bucket files. Returns the number of sites.
+
+    Raises ValueError unless the "sharded" storage engine is in use.
+    """
+    engine = _storage()
+    if not isinstance(engine, storage.ShardedStorage):
+        raise ValueError("Resharding needs the sharded storage engine (see set_storage_mode)")
+    return engine.reshard(count)
+
+
+def convert_vault(session: VaultSession, binary: bool, cipher_id: int = vaultFormat.CIPHER_AESGCM) -> int:
+    """Rewrite password.json in the binary format (`binary=True`) or back to JSON.
+
+    Every entry is decrypted and re-encrypted for the target format. Nothing
+    is written if any entry cannot be decrypted (ValueError). Returns the
+    number of entries converted.
+    """
+    _require_session(session)
+    data = _read_password_file()
+    pairs = [(site, item) for site, entries in data.items() for item in entries]
+    decrypted = _decrypt_entries(pairs, session)
+    if any(c is None for c in decrypted):
+        raise ValueError("Conversion aborted: some entries cannot be decrypted")
+
+    aead = vaultFormat.make_aead(session, cipher_id) if binary else None
+    converted: dict = {}
+    for (site, _), (user, password) in zip(pairs, decrypted):
+        converted.setdefault(site, []).append(_encode_entry(site, user, password, session, aead))
+    _write_password_file(converted, binary=binary, cipher_id=cipher_id)
+    return len(pairs)
 
 
-def _write_password_file(data: Dict):
-    with open(PASSWORD_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
+class Transaction:
+    """Puts and deletes staged in memory and committed to storage in one write.
 
+    Use it through `transaction(session)`:
 
-def store_json(site: str, user: str, password: str, master_password: str) -> None:
+        with manager.transaction(session) as tx:
+            tx.delete(site, username=user)
+            tx.put(site, user, password)
+
+    Sites are read from storage the first time the transaction touches them
+    and then only from the staged copy. Leaving the block normally commits
+    every change at once (one file write, one journal line or one SQLite
+    transaction); an exception discards them and nothing is written.
+    """
+
+    def __init__(self, session: VaultSession):
+        _require_session(session)
+        self.session = session
+        self._aead = _binary_aead(session)
+        # site -> new entry list, or None if the site is removed
+        self._staged: dict[str, list | None] = {}
+
+    def _entries(self, site: str) -> list | None:
+        if site in self._staged:
+            return self._staged[site]
+        return _storage().get_site(site)
+
+    def put(self, site: str, user: str, password: str):
+        """Stage a new entry for `site` (see store_json)."""
+        entry = _encode_entry(site, user, password, self.session, self._aead)
+        self._staged[site] = (self._entries(site) or []) + [entry]
+
+    def put_many(self, rows: list[tuple[str, str, str]]):
+        """Stage many (site, user, password) rows, encrypting them as one batch."""
+        encoded = _encode_entries(rows, self.session, self._aead)
+        by_site: dict[str, list] = {}
+        for (site, _, _), entry in zip(rows, encoded):
+            by_site.setdefault(site, []).append(entry)
+        for site, new_entries in by_site.items():
+            self._staged[site] = (self._entries(site) or []) + new_entries
+
+    def credentials(self, site: str) -> list[tuple[str, str] | None]:
+        """Return the decrypted (user, password) of every entry of `site` as staged so far (None if unreadable)."""
+        entries = self._entries(site) or []
+        return _decrypt_entries([(site, item) for item in entries], self.session, self._aead)
+
+    def has(self, site: str, username: str) -> bool:
+        """True if `site` has an entry for `username` as staged so far (see has_username)."""
+        entries = self._entries(site)
+        return bool(entries) and bool(_username_matches(site, entries, username, self.session, self._aead))
+
+    def delete(self, site: str, username: str | None = None) -> bool:
+        """Stage the removal of `site`, or only of its `username` entry (see delete_site)."""
+        entries = self._entries(site)
+        if entries is None:
+            return False
+
+        # If no username provided, remove whole site
+        if username is None:
+            self._staged[site] = None
+            return True
+
+        # entries that cannot be decrypted never match, so they are kept
+        matches = set(_username_matches(site, entries, username, self.session, self._aead))
+        if not matches:
+            return False
+        new_entries = [item for i, item in enumerate(entries) if i not in matches]
+        # no entries left for site -> the site is removed
+        self._staged[site] = new_entries or None
+        return True
+
+    def commit(self):
+        """Write every staged change at once."""
+        if self._staged:
+            _storage().apply_sites(self._staged)
+            _index_changes(self._staged)
+            _backup(self._staged)
+        self._staged = {}
+
+    def rollback(self):
+        """Drop every staged change."""
+        self._staged = {}
+
+    def __enter__(self) -> "Transaction":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+
+def transaction(session: VaultSession) -> Transaction:
+    """Start a batch of puts and deletes that is committed in a single write (see Transaction)."""
+    return Transaction(session)
+
+
+def store_json(site: str, user: str, password: str, session: VaultSession) -> None:
     """Store encrypted user/password under site name.
 
     New stored JSON format is:
     {
       "site": [
-          {"username": "<token>", "password": "<token>"},
+          {"v": 2, "data": "<token>", "h": "<username tag>"},
           ...
       ]
     }
+    In a binary vault the entry is written as a binary record instead.
     """
-    _ensure_key(master_password)
-    data = _read_password_file()
-    enc_user = encrypt.encrypt_message(user, master_password)
-    enc_pass = encrypt.encrypt_message(password, master_password)
-    entry = {"username": enc_user, "password": enc_pass}
-
-    existing = data.get(site)
-    if existing is None:
-        data[site] = [entry]
-    elif isinstance(existing, list):
-        existing.append(entry)
-        data[site] = existing
-    elif isinstance(existing, dict):
-        # legacy single-entry format -> convert to list
-        data[site] = [existing, entry]
-    else:
-        data[site] = [entry]
-
-    _write_password_file(data)
+    with transaction(session) as tx:
+        tx.put(site, user, password)
 
 
 class Success(TypedDict):
     ok: bool
+    # stored site name the credentials belong to (may differ from the name asked for, see resolve_site)
+    site: str
     user: list
 
 class Error(TypedDict):
@@ -106,170 +508,260 @@ class Error(TypedDict):
     code: int
     message: str
 
-def get_data(site: str, master_password: str) -> Success | Error:
-    """Return decrypted credentials for site, or Error dictionary if any errors."""
-    _ensure_key(master_password)
-    data = _read_password_file()
-    entry = data.get(site)
-    if not entry:
-        return {"ok": False, "code": 404, "message": "Site not found"}
+def get_data(site: str, session: VaultSession) -> Success | Error:
+    """Return decrypted credentials for site, or Error dictionary if any errors.
 
-    # Normalize to list for legacy and new formats
-    entries = entry if isinstance(entry, list) else [entry]
+    A name that is not stored as typed is resolved by its identity
+    ("GitHub" or "https://github.com/login" finds "github.com", see
+    resolve_site); the first match is used, so a stored "GitHub" wins over
+    "github.com" for "Github".
+    """
+    _require_session(session)
+    engine = _storage()
+    entries = engine.get_site(site)
+    if not entries:
+        matches = resolve_site(site)
+        if not matches:
+            return {"ok": False, "code": 404, "message": "Site not found"}
+        site = matches[0]
+        entries = engine.get_site(site)
 
     results: list[dict] = []
-    try:
-        for item in entries:
-            # item may be legacy dict with keys 'user'/'password' or new with 'username'/'password'
-            user_token = item.get("user") if "user" in item else item.get("username")
-            pwd_token = item.get("password")
-            results.append({
-                "user": decrypt_message(user_token, master_password),
-                "password": decrypt_message(pwd_token, master_password)
-            })
-        return {"ok": True, "user": results}
-    except ValueError as e:
-        logger.warning("Failed to decrypt entry for site %s: %s", site, e)
-        return {"ok": False, "code": 403, "message": "Decryption failed"}
-
-def list_sites(master_password: str) -> Dict[str, list]:
+    for creds in _decrypt_entries([(site, item) for item in entries], session):
+        if creds is None:
+            logger.warning("Failed to decrypt entry for site %s", site)
+            return {"ok": False, "code": 403, "message": "Decryption failed"}
+        results.append({"user": creds[0], "password": creds[1]})
+    return {"ok": True, "site": site, "user": results}
+
+def list_sites(session: VaultSession) -> Dict[str, list]:
     """Return a dictionary of all stored sites with decrypted credentials.
 
     Each site maps to a list of entries: [{"user": str, "password": str}, ...]
+    All fields are decrypted as one batch; an entry that fails to decrypt
+    becomes {"user": None, "password": None}.
     """
-    _ensure_key(master_password)
+    _require_session(session)
     data = _read_password_file()
     result: dict = {}
-    for site, creds in data.items():
-        try:
-            entries = creds if isinstance(creds, list) else [creds]
-            decrypted: list[dict] = []
-            for item in entries:
-                try:
-                    user_token = item.get("user") if "user" in item else item.get("username")
-                    decrypted.append({
-                        "user": decrypt_message(user_token, master_password),
-                        "password": decrypt_message(item["password"], master_password)
-                    })
-                except ValueError:
-                    decrypted.append({"user": None, "password": None})
-            result[site] = decrypted
-        except Exception:
-            logger.debug("Could not process site %s", site)
-            result[site] = []
+    layout: list[tuple[str, int]] = []
+    flat: list = []
+    for site, entries in data.items():
+        flat.extend((site, item) for item in entries)
+        layout.append((site, len(entries)))
+
+    decrypted = _decrypt_entries(flat, session)
+    pos = 0
+    for site, count in layout:
+        result[site] = [
+            {"user": c[0], "password": c[1]} if c is not None else {"user": None, "password": None}
+            for c in decrypted[pos:pos + count]
+        ]
+        pos += count
     return result
 
+def iter_credentials(session: VaultSession, batch_size: int = 256) -> Iterator[tuple[str, str | None, str | None]]:
+    """Yield (site, user, password) for every entry, decrypting `batch_size` entries at a time.
+
+    Only one batch of plaintext exists at any moment, so callers that write
+    each row out (see exporter) use constant memory for the plaintext.
+    Entries that cannot be decrypted yield (site, None, None).
+    """
+    _require_session(session)
+    data = _read_password_file()
+    aead = _binary_aead(session)
+
+    def decrypted(pairs):
+        for (site, _), creds in zip(pairs, _decrypt_entries(pairs, session, aead)):
+            yield (site, creds[0], creds[1]) if creds is not None else (site, None, None)
+
+    pairs: list = []
+    for site, entries in data.items():
+        pairs.extend((site, item) for item in entries)
+        if len(pairs) >= batch_size:
+            yield from decrypted(pairs)
+            pairs = []
+    yield from decrypted(pairs)
+
 def list_site_names() -> list[str]:
     """Return a list of all stored site names."""
-    data = _read_password_file()
-    return list(data.keys())
+    return _storage().site_names()
+
+def resolve_site(value: str) -> list[str]:
+    """Return the stored site names that `value` (a name, domain or URL) refers to, best match first.
+
+    Names are compared by identity (siteIdentity.identity_keys): the same
+    host first, then the same registrable domain. A plain name ("GitHub")
+    also matches domains of that name; a URL never does by name alone.
+    Among equally good matches a stored name equal to `value` (normalized)
+    comes first, then a site that is exactly the matched host or domain,
+    then the others, each group in case-folded name order.
+    One dict lookup per key, nothing is decrypted.
+    """
+    return _sites().lookup(value)
+
+def has_username(site: str, username: str, session: VaultSession) -> bool:
+    """True if `site` already has an entry for exactly `username` (blind index tag, then decrypted to compare)."""
+    _require_session(session)
+    entries = _storage().get_site(site)
+    return bool(entries) and bool(_username_matches(site, entries, username, session))
 
-def delete_site(site: str, master_password: str, username: str | None = None) -> bool:
+def find_username(username: str, session: VaultSession) -> list[str]:
+    """Return the sites that have an entry for exactly `username`.
+
+    The tag index names the candidate sites without a scan; only their
+    entries under the username's tag are decrypted and compared.
+    """
+    _require_session(session)
+    sites: list[str] = []
+    for site in _tags().lookup(blindIndex.tag(session, username)):
+        entries = _storage().get_site(site)
+        if entries and _username_matches(site, entries, username, session):
+            sites.append(site)
+    return sites
+
+def delete_site(site: str, session: VaultSession, username: str | None = None) -> bool:
     """Delete entries.
 
     If `username` is None: delete entire site (legacy behavior).
-    If `username` is provided: delete only the matching username entry (decrypted match).
+    If `username` is provided: delete only the entries for exactly that username (see has_username).
     Returns True if something was deleted, False otherwise.
     """
-    _ensure_key(master_password)
-    data = _read_password_file()
-    existing = data.get(site)
-    if existing is None:
-        return False
+    with transaction(session) as tx:
+        return tx.delete(site, username)
 
-    # If no username provided, remove whole site
-    if username is None:
-        del data[site]
-        _write_password_file(data)
-        return True
+# Label shown for a multi-entry site until its username has been decrypted
+PENDING_USERNAME = "..."
 
-    # Normalize to list
-    entries = existing if isinstance(existing, list) else [existing]
-    new_entries: list = []
-    deleted = False
-    for item in entries:
-        # item may store encrypted under 'username' or legacy 'user'
-        token = item.get("username") if "username" in item else item.get("user")
-        try:
-            decrypted = decrypt_message(token, master_password)
-        except Exception:
-            # If decryption fails, keep the entry to avoid accidental deletion
-            new_entries.append(item)
-            continue
+# Username shown for a multi-entry site entry that cannot be decrypted; such a
+# row cannot be told apart from its siblings, so it is never deleted by username
+UNREADABLE_USERNAME = "<error>"
 
-        if decrypted == username:
-            deleted = True
-            # skip adding to new_entries to delete it
-        else:
-            new_entries.append(item)
-
-    if deleted:
-        if new_entries:
-            data[site] = new_entries
-        else:
-            # no entries left for site
-            del data[site]
-        _write_password_file(data)
-        return True
-
-    return False
 
 class SiteDisplayItem(TypedDict):
     label: str
     site: str
     username: str | None
+    token: str | bytes | None
+    v: int
+    # identifies the entry within its site for as long as the entry is unchanged,
+    # also after its label is resolved (None for a single-entry site)
+    ref: str | bytes | None
 
 class SiteDisplaySuccess(TypedDict):
     ok: bool
     items: list[SiteDisplayItem]
 
-def get_site_display_names(master_password: str) -> SiteDisplaySuccess | Error:
+def _display_label(site: str, user: str | None) -> str:
+    return f"{site} | {user if user is not None else PENDING_USERNAME}"
+
+def get_site_display_names(session: VaultSession) -> SiteDisplaySuccess | Error:
     """
-    Return site names for UI display.
+    Return site names for UI display without decrypting anything.
 
     - If a site appears once, return just the site name.
     - If a site appears multiple times, append ' | {username}'.
+
+    Usernames already in the session's label cache are used directly; the
+    rest keep their encrypted `token` and a placeholder label until
+    `resolve_display_names` (or `resolve_username`) decrypts them.
     """
-    _ensure_key(master_password)
+    _require_session(session)
     data = _read_password_file()
 
     if not data:
         return {"ok": False, "code": 404, "message": "No sites were found."}
 
+    cache = session.label_cache
     items: list[dict] = []
 
-    for site, creds in data.items():
-        entries = creds if isinstance(creds, list) else [creds]
-
+    for site, entries in data.items():
         if len(entries) == 1:
-            try:
-                user = decrypt_message(
-                    entries[0].get("username") or entries[0].get("user"),
-                    master_password
-                )
-            except ValueError:
-                user = None
-
             items.append({
                 "label": site,
                 "site": site,
-                "username": None
+                "username": None,
+                "token": None,
+                "v": _entry_version(entries[0]),
+                "ref": None
             })
         else:
-            for entry in entries:
-                try:
-                    user = decrypt_message(
-                        entry.get("username") or entry.get("user"),
-                        master_password
-                    )
-                except ValueError:
-                    user = "<error>"
-
+            for n, entry in enumerate(entries):
+                token = _label_token(entry)
+                # no ciphertext (e.g. an unreadable v1 entry): nothing to resolve later
+                user = cache.get(token) if token else UNREADABLE_USERNAME
                 items.append({
-                    "label": f"{site} | {user}",
+                    "label": _display_label(site, user),
                     "site": site,
-                    "username": user
+                    "username": user,
+                    "token": None if user is not None else token,
+                    "v": _entry_version(entry),
+                    # the ciphertext is unique per entry; an entry without one keeps its position
+                    "ref": token or f"#{n}"
                 })
 
     return {"ok": True, "items": items}
 
+def _decrypt_labels(items: list[SiteDisplayItem], session: VaultSession) -> list[str | None]:
+    """Decrypt the usernames of pending display items (Fernet tokens in one batch, binary records directly)."""
+    fernet_items = [item for item in items if item.get("v") != vaultFormat.ENTRY_VERSION]
+    plains = iter(encrypt.decrypt_many([item["token"] for item in fernet_items], session.fernet))
+    aead = None
+    users: list = []
+    for item in items:
+        if item.get("v") == vaultFormat.ENTRY_VERSION:
+            if aead is None:
+                aead = _binary_aead(session)
+            token = item["token"]
+            entry = {"nonce": token[:vaultFormat.NONCE_SIZE], "ct": token[vaultFormat.NONCE_SIZE:]}
+            plain = vaultFormat.open_entry(aead, item["site"], entry) if aead else None
+        else:
+            plain = next(plains)
+        users.append(_username_from_plain(plain))
+    return users
+
+def resolve_display_names(items: list[SiteDisplayItem], session: VaultSession) -> list[SiteDisplayItem]:
+    """Return a copy of `items` with every pending username decrypted in one batch.
+
+    Safe to call from a worker thread: the input items are not modified.
+    Results are remembered in the session's label cache.
+    """
+    _require_session(session)
+    pending = [item for item in items if item.get("token")]
+    for item, user in zip(pending, _decrypt_labels(pending, session)):
+        if user is not None:
+            session.label_cache[item["token"]] = user
+
+    resolved: list[dict] = []
+    for item in items:
+        token = item.get("token")
+        if not token:
+            resolved.append(dict(item))
+            continue
+        user = session.label_cache.get(token, UNREADABLE_USERNAME)
+        resolved.append({
+            "label": _display_label(item["site"], user),
+            "site": item["site"],
+            "username": user,
+            "token": None,
+            "v": item.get("v", 1),
+            "ref": item.get("ref")
+        })
+    return resolved
+
+def resolve_username(item: SiteDisplayItem | None, session: VaultSession) -> str | None:
+    """Decrypt the username of a single display item on demand (e.g. when it is clicked before the background pass).
+
+    None for an item without a pending username (a single-entry site);
+    UNREADABLE_USERNAME if the username cannot be decrypted.
+    """
+    token = item.get("token") if item else None
+    if not token:
+        return None
+    user = session.label_cache.get(token)
+    if user is None:
+        user = _decrypt_labels([item], session)[0]
+        if user is None:
+            return UNREADABLE_USERNAME
+        session.label_cache[token] = user
+    return user
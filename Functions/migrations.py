@@ -0,0 +1,161 @@
+# migrations.py
+# One-shot upgrades of the whole vault to the current schema, run once at unlock.
+#
+# config.json records the schema of the stored entries under "schema"
+# (vaults from before this runner have none, i.e. schema 0). A step is
+# registered per target version and upgrades the loaded vault in memory;
+# `migrate` runs every pending step in order, writes the vault once and
+# only then stamps the new version. manager's readers only understand
+# SCHEMA_VERSION, so older layouts never reach them.
+#
+# To add a schema bump: increase SCHEMA_VERSION and register its step:
+#
+#     @step(3)
+#     def _to_v3(data, session, aead, stats): ...
+import json
+from typing import Callable, TypedDict
+from Functions import blindIndex, encrypt, fileManager, manager, vaultConfig, vaultFormat
+from Functions.session import VaultSession
+
+SCHEMA_VERSION = 2
+
+# target version -> step(data, session, aead, stats) returning the upgraded vault
+MIGRATIONS: dict[int, Callable] = {}
+
+
+class MigrationResult(TypedDict):
+    ok: bool
+    from_version: int
+    to_version: int
+    # entries re-encoded into the current format
+    upgraded: int
+    # legacy entries that could not be decrypted; they are kept as they were
+    unreadable: int
+    # copy of the vault as it was before the upgrade (None if nothing was stored)
+    backup: str | None
+
+
+def step(version: int):
+    """Register the function that upgrades the vault from `version - 1` to `version`."""
+    def register(fn):
+        MIGRATIONS[version] = fn
+        return fn
+    return register
+
+
+def schema_version(config: dict) -> int:
+    """Return the schema recorded in `config` (0 for vaults older than the migration runner)."""
+    return int(config.get("schema", 0))
+
+
+def pending(config: dict) -> bool:
+    """True if the vault described by `config` needs `migrate` before it can be read."""
+    return schema_version(config) < SCHEMA_VERSION
+
+
+def _backup(data: dict, version: int, binary: bool, cipher_id: int) -> str | None:
+    """Write the vault as loaded to Data/password_premigration_v<version>.json|.bin."""
+    if not data:
+        return None
+    if binary:
+        payload, suffix = vaultFormat.serialize(data, cipher_id), ".bin"
+    else:
+        payload, suffix = json.dumps(data, indent=4).encode("utf-8"), ".json"
+    path = fileManager.data_path(f"password_premigration_v{version}{suffix}")
+    fileManager.write_atomic(path, payload)
+    return str(path)
+
+
+# ---------- schema 1: every site is a list of v2 (JSON) or v3 (binary) entries ----------
+# Before schema 1 a site could be a bare entry dict, and entries could be v1:
+# {"username"|"user": <token>, "password": <token>}, each field its own Fernet token.
+
+def _legacy_tokens(item: dict) -> list:
+    user = item.get("username") if "username" in item else item.get("user")
+    return [user, item.get("password")]
+
+
+@step(1)
+def _to_v1(data: dict, session: VaultSession, aead, stats: MigrationResult) -> dict:
+    target = vaultFormat.ENTRY_VERSION if aead is not None else manager.ENTRY_VERSION
+    upgraded = {site: list(creds) if isinstance(creds, list) else [creds] for site, creds in data.items()}
+
+    old = [(site, i) for site, entries in upgraded.items() for i, item in enumerate(entries)
+           if isinstance(item, dict) and manager._entry_version(item) != target]
+    v1 = [(site, i) for site, i in old if manager._entry_version(upgraded[site][i]) == 1]
+    current = [(site, i) for site, i in old if manager._entry_version(upgraded[site][i]) != 1]
+
+    # v1 entries: two tokens each, decrypted as one batch
+    tokens = [token for site, i in v1 for token in _legacy_tokens(upgraded[site][i])]
+    plain = encrypt.decrypt_many(tokens, session.fernet)
+    rows: list = []
+    for n, (site, i) in enumerate(v1):
+        user, password = plain[2 * n], plain[2 * n + 1]
+        if user is None or password is None:
+            stats["unreadable"] += 1
+        else:
+            rows.append((site, i, user, password))
+
+    # v2 entries of a binary vault (or v3 records left in a JSON one)
+    for (site, i), creds in zip(current, manager._decrypt_entries(
+            [(site, upgraded[site][i]) for site, i in current], session, aead)):
+        if creds is None:
+            stats["unreadable"] += 1
+        else:
+            rows.append((site, i, creds[0], creds[1]))
+
+    encoded = manager._encode_entries([(site, user, password) for site, _, user, password in rows], session, aead)
+    for (site, i, _, _), entry in zip(rows, encoded):
+        upgraded[site][i] = entry
+    stats["upgraded"] += len(rows)
+    return upgraded
+
+
+# ---------- schema 2: JSON entries carry the blind index tag of their username ("h", see blindIndex) ----------
+
+@step(2)
+def _to_v2(data: dict, session: VaultSession, aead, stats: MigrationResult) -> dict:
+    untagged = [(site, i) for site, entries in data.items() for i, item in enumerate(entries)
+                if isinstance(item, dict) and item.get("v") == manager.ENTRY_VERSION and "h" not in item]
+    tagged = {site: list(entries) for site, entries in data.items()}
+    decrypted = manager._decrypt_entries([(site, data[site][i]) for site, i in untagged], session)
+    for (site, i), creds in zip(untagged, decrypted):
+        if creds is None:
+            stats["unreadable"] += 1
+            continue
+        tagged[site][i] = {**data[site][i], "h": blindIndex.tag(session, creds[0])}
+        stats["upgraded"] += 1
+    return tagged
+
+
+def migrate(session: VaultSession, config: dict | None = None) -> MigrationResult:
+    """Upgrade the stored vault to SCHEMA_VERSION and record it in config.json.
+
+    The vault is backed up first, then every pending step runs on the data
+    in memory and the result is written once. Entries that cannot be
+    decrypted are kept unchanged. Does nothing if the vault is current.
+    """
+    manager._require_session(session)
+    config = vaultConfig.load_config() if config is None else config
+    start = schema_version(config)
+    result: MigrationResult = {"ok": True, "from_version": start, "to_version": start,
+                               "upgraded": 0, "unreadable": 0, "backup": None}
+    if start >= SCHEMA_VERSION:
+        return result
+
+    engine = manager._storage()
+    binary = engine.is_binary()
+    cipher_id = engine.cipher_id()
+    data = manager._read_password_file()
+    result["backup"] = _backup(data, start, binary, cipher_id)
+
+    aead = vaultFormat.make_aead(session, cipher_id) if binary else None
+    for version in range(start + 1, SCHEMA_VERSION + 1):
+        data = MIGRATIONS[version](data, session, aead, result)
+
+    manager._write_password_file(data)
+    manager.flush()
+    config["schema"] = SCHEMA_VERSION
+    vaultConfig.save_config(config)
+    result["to_version"] = SCHEMA_VERSION
+    return result
@@ -0,0 +1,169 @@
+# Functions/reencrypt.py
+# Re-encrypts every entry of password.json under a new key in checkpointed chunks, then swaps the file in atomically.
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Callable
+from cryptography.fernet import Fernet
+from Functions import encrypt, fileManager, vaultFormat
+
+PASSWORD_FILE = fileManager.data_path("password.json")
+
+# Entry fields that hold Fernet tokens (v2, v1 and legacy layouts)
+TOKEN_FIELDS = ("data", "user", "username", "password")
+
+# Entries re-encrypted between two checkpoints
+CHUNK_SIZE = 2000
+
+
+def _work_paths(path: Path) -> tuple[Path, Path]:
+    """Return the (partial output, checkpoint) paths next to `path`."""
+    return path.with_name(path.name + ".rekey.tmp"), path.with_name(path.name + ".rekey.ckpt")
+
+
+def _load_checkpoint(ckpt: Path, tmp: Path, source_digest: str, new_cipher: Fernet) -> dict | None:
+    """Return the saved checkpoint if it belongs to this source file and target key."""
+    if not ckpt.exists() or not tmp.exists():
+        return None
+    try:
+        state = json.loads(ckpt.read_text(encoding="utf-8"))
+        if state.get("source") != source_digest:
+            return None
+        # only resume if the partial output was written with the same new key
+        new_cipher.decrypt(state["key_check"].encode())
+        if tmp.stat().st_size < state["bytes"]:
+            return None
+        return state
+    except Exception:
+        return None
+
+
+def _entry_list(creds) -> list:
+    return creds if isinstance(creds, list) else [creds]
+
+
+def _cleanup(*paths: Path):
+    for p in paths:
+        try:
+            p.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def decrypts_with(cipher: Fernet, path: Path | None = None) -> bool:
+    """True if the first token in the vault file decrypts under `cipher` (also for an empty vault).
+
+    Tells a finished run whose caller never recorded it apart from one
+    that still has to be (re)started.
+    """
+    path = Path(path or PASSWORD_FILE)
+    raw = path.read_bytes() if path.exists() else b"{}"
+    if vaultFormat.is_binary(raw):
+        return False
+    for creds in (json.loads(raw or b"{}") or {}).values():
+        for entry in _entry_list(creds):
+            if not isinstance(entry, dict):
+                continue
+            for field in TOKEN_FIELDS:
+                if field in entry:
+                    try:
+                        cipher.decrypt(str(entry[field]).encode())
+                    except Exception:
+                        return False
+                    return True
+    return True
+
+
+def reencrypt_file(old_cipher: Fernet, new_cipher: Fernet, path: Path | None = None,
+                   progress: Callable[[int, int], None] | None = None, workers: int | None = None,
+                   chunk_size: int = CHUNK_SIZE, strict: bool = True) -> dict:
+    """Re-encrypt every token in the vault file from `old_cipher` to `new_cipher`.
+
+    Sites are processed in chunks of about `chunk_size` entries through the
+    batch crypto pool. Each finished chunk is appended to a partial file and
+    recorded in a checkpoint, so a run that is interrupted resumes where it
+    stopped (as long as the source file and the new key are the same). The
+    original file is only replaced, atomically, once everything is done.
+
+    `progress(done, total)` is called after every chunk, from the calling thread.
+    With `strict`, any token that fails to decrypt aborts the run with ValueError;
+    otherwise it is kept as-is.
+
+    Returns {"sites": int, "entries": int, "resumed_at": int}.
+    """
+    path = Path(path or PASSWORD_FILE)
+    tmp, ckpt = _work_paths(path)
+    raw = path.read_bytes() if path.exists() else b"{}"
+    if vaultFormat.is_binary(raw):
+        raise ValueError("Binary vaults are not Fernet-encrypted; convert them with manager.convert_vault")
+    source_digest = hashlib.sha256(raw).hexdigest()
+    data = json.loads(raw or b"{}") or {}
+    sites = list(data.items())
+    total = sum(len(_entry_list(creds)) for _, creds in sites)
+
+    state = _load_checkpoint(ckpt, tmp, source_digest, new_cipher)
+    if state:
+        done_sites, done_entries = state["sites"], state["entries"]
+        with open(tmp, "r+b") as f:
+            f.truncate(state["bytes"])
+    else:
+        done_sites = done_entries = 0
+        tmp.write_bytes(b"")
+    resumed_at = done_entries
+    key_check = new_cipher.encrypt(b"rekey").decode("utf-8")
+
+    with open(tmp, "ab") as out:
+        i = done_sites
+        while i < len(sites):
+            chunk: list = []
+            count = 0
+            while i < len(sites) and (count < chunk_size or not chunk):
+                chunk.append(sites[i])
+                count += len(_entry_list(sites[i][1]))
+                i += 1
+
+            # (entry, field) for every token in the chunk, in order
+            slots = [(entry, field) for _, creds in chunk for entry in _entry_list(creds)
+                     for field in TOKEN_FIELDS if isinstance(entry, dict) and field in entry]
+            plain = encrypt.decrypt_many([entry[field] for entry, field in slots], old_cipher, workers)
+            if strict and any(p is None for p in plain):
+                _cleanup(tmp, ckpt)
+                raise ValueError("Re-encryption failed: cannot decrypt existing entries")
+            fresh = encrypt.encrypt_many([p or "" for p in plain], new_cipher, workers)
+
+            # build the new entries without mutating the loaded source
+            rebuilt = iter(zip(plain, fresh))
+            for site, creds in chunk:
+                new_entries = []
+                for entry in _entry_list(creds):
+                    if not isinstance(entry, dict):
+                        new_entries.append(entry)
+                        continue
+                    new_entry = dict(entry)
+                    for field in TOKEN_FIELDS:
+                        if field in entry:
+                            p, token = next(rebuilt)
+                            if p is not None:
+                                new_entry[field] = token
+                    new_entries.append(new_entry)
+                value = new_entries if isinstance(creds, list) else new_entries[0]
+                out.write(json.dumps([site, value]).encode("utf-8") + b"\n")
+            out.flush()
+            os.fsync(out.fileno())
+
+            done_entries += count
+            checkpoint = {"source": source_digest, "key_check": key_check, "sites": i,
+                          "entries": done_entries, "bytes": out.tell()}
+            fileManager.write_atomic(ckpt, json.dumps(checkpoint).encode("utf-8"))
+            if progress:
+                progress(done_entries, total)
+
+    result: dict = {}
+    with open(tmp, "r", encoding="utf-8") as f:
+        for line in f:
+            site, value = json.loads(line)
+            result[site] = value
+    fileManager.write_atomic(path, json.dumps(result, indent=4).encode("utf-8"))
+    _cleanup(tmp, ckpt)
+    return {"sites": len(sites), "entries": total, "resumed_at": resumed_at}
@@ -0,0 +1,26 @@
+# reshard.py
+# Command-line tool for the sharded storage engine: move a vault into it and change its bucket count.
+# Run from the repo root: python -m Functions.reshard 32
+import argparse
+from Functions import manager
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Redistribute the sharded vault over a new number of bucket files.")
+    parser.add_argument("count", type=int, help="number of bucket files")
+    parser.add_argument("--convert", action="store_true",
+                        help="move the vault to the sharded engine first if it uses another one")
+    args = parser.parse_args(argv)
+
+    if args.convert and manager._storage().name != "sharded":
+        moved = manager.set_storage_mode("sharded")
+        print(f"Moved {moved} sites to the sharded engine")
+    try:
+        sites = manager.reshard(args.count)
+    except ValueError as e:
+        parser.exit(1, f"error: {e}\n")
+    print(f"Resharded {sites} sites into {args.count} buckets")
+
+
+if __name__ == "__main__":
+    main()
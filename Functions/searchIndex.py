@@ -0,0 +1,257 @@
+# searchIndex.py
+# In-memory search over the site labels shown by the UI: normalized keys, a prefix table and a trigram index.
+#
+# Results are ranked exact > prefix > substring > fuzzy (the query's
+# characters in order, e.g. "gthb" finds "github.com"; only tried when
+# few better matches exist). A query that only extends the previous one
+# is answered from the previous substring matches, not the whole list.
+# A URL or domain query ("https://github.com/login") first gets the items
+# of the same site by identity (see siteIdentity), then the text matches;
+# while no site matches (a URL still being typed) its host is matched as text.
+#
+# Every keystroke has to fit in a frame (16.7 ms) at 100k labels (see
+# benchmarks/bench_search.py), so a broad query (one or two characters, or
+# a common trigram) returns at most SHORT_LIMIT items and says whether
+# there were more (search_page; the UI offers to show them all), and the
+# fuzzy pass scans at most FUZZY_SCAN_CHARS more of the keys per query.
+import bisect
+import re
+from array import array
+from itertools import islice
+from Functions import siteIdentity
+
+# Shortest query that uses the trigram index; shorter ones scan the keys
+GRAM = 3
+
+# Fuzzy matches are only looked for when a query of at least FUZZY_MIN_LENGTH
+# characters has fewer than FUZZY_BELOW better matches
+FUZZY_MIN_LENGTH = 3
+FUZZY_BELOW = 50
+
+# Results of a broad query (it matches a large part of the labels, and
+# nobody scrolls through tens of thousands of them)
+SHORT_LIMIT = 500
+
+# Characters of the joined keys one fuzzy pass may scan (about 20k
+# labels); a longer query carries on where the previous one stopped
+FUZZY_SCAN_CHARS = 400_000
+
+
+def normalize(text: str) -> str:
+    """Case-fold `text` and collapse runs of whitespace, the form every key and query is compared in."""
+    return " ".join((text or "").casefold().split())
+
+
+class SearchIndex:
+    """Ranked search over `items` (dicts) by their `field` string.
+
+    The normalized keys and the key order (for exact and prefix matches by
+    binary search) are computed here. The postings of a trigram (the ids
+    whose key contains it) are computed the first time a query narrows by
+    that trigram and kept; indexing every trigram up front costs about a
+    second per 100k labels, mostly for trigrams nobody types. A query is
+    narrowed by its rarest trigram and the candidates checked directly.
+    """
+
+    def __init__(self, items, field: str = "label", site_field: str = "site"):
+        self.items = list(items)
+        self.site_field = site_field
+        self.keys = [normalize(item.get(field) if isinstance(item, dict) else str(item)) for item in self.items]
+        self._order = sorted(range(len(self.keys)), key=self.keys.__getitem__)
+        self._sorted_keys = [self.keys[i] for i in self._order]
+        # one line per key, for fuzzy matching with a single regex pass
+        self._blob = "\n".join(self.keys)
+        self._line_starts = array("I", [0] * len(self.keys))
+        pos = 0
+        for i, key in enumerate(self.keys):
+            self._line_starts[i] = pos
+            pos += len(key) + 1
+
+        self._grams: dict[str, array] = {}
+        # site -> identity keys, filled for the sites URL queries look at
+        self._site_keys: dict[str, list[str]] = {}
+        # (query, every id whose key holds it as a subsequence within _blob[:end], end)
+        self._fuzzy_state: tuple[str, list[int], int] | None = None
+
+        self._last_query = ""
+        self._last_matches: list[int] | None = None
+        # URL queries need the suffix list; reading it on the first one would cost several frames
+        siteIdentity.preload()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def _prefixed(self, query: str) -> list[int]:
+        """Ids whose key starts with `query`, exact matches first, then in key order."""
+        lo = bisect.bisect_left(self._sorted_keys, query)
+        hi = bisect.bisect_left(self._sorted_keys, query + "\uffff", lo)
+        return self._order[lo:hi]
+
+    def _line_of(self, pos: int) -> int:
+        return bisect.bisect_right(self._line_starts, pos) - 1
+
+    def _postings(self, gram: str, count: int | None = None) -> array:
+        """Ids whose key contains `gram`; `count` is its number of occurrences in the keys, if known."""
+        ids = self._grams.get(gram)
+        if ids is None:
+            if count is None:
+                count = self._blob.count(gram)
+            if count * 8 > len(self.keys):
+                # common trigram: testing every key is cheaper than locating each occurrence
+                ids = array("I", [i for i, key in enumerate(self.keys) if gram in key])
+            else:
+                # one C-level scan of the joined keys; Python work only per occurrence
+                ids = array("I")
+                last = -1
+                for match in re.finditer(re.escape(gram), self._blob):
+                    i = self._line_of(match.start())
+                    if i != last:
+                        ids.append(i)
+                        last = i
+            self._grams[gram] = ids
+        return ids
+
+    def _substring(self, query: str) -> list[int] | None:
+        """Ids whose key contains `query`, in item order.
+
+        None if the query is broad (shorter than GRAM, or its rarest trigram
+        is in more than 1/8 of the keys): listing every match would cost a
+        scan of all keys for a list nobody reads, so search caps those.
+        """
+        keys = self.keys
+        if self._last_matches is not None and self._last_query and query.startswith(self._last_query):
+            candidates = self._last_matches
+        elif len(query) >= GRAM:
+            grams = [query[j:j + GRAM] for j in range(len(query) - GRAM + 1)]
+            known = [g for g in grams if g in self._grams]
+            if known:
+                candidates = min((self._grams[g] for g in known), key=len)
+            else:
+                # str.count runs in C; only the rarest trigram gets its postings built
+                counts = {g: self._blob.count(g) for g in {grams[0], grams[len(grams) // 2], grams[-1]}}
+                rarest = min(counts, key=counts.get)
+                if counts[rarest] * 8 > len(keys):
+                    return None
+                candidates = self._postings(rarest, counts[rarest])
+        else:
+            return None
+        return [i for i in candidates if query in keys[i]]
+
+    def _fuzzy(self, query: str, exclude: set) -> list[int]:
+        """Ids whose key holds the characters of `query` in order, skipping `exclude`.
+
+        Stops at FUZZY_BELOW new ids or after FUZZY_SCAN_CHARS characters of
+        the keys. Every match of a query is also a match of its prefixes,
+        so a query that extends the previous fuzzy query only re-checks the
+        ids found so far and scans on from where that one stopped.
+        """
+        # leftmost-greedy subsequence match; negated classes keep it linear per line
+        pattern = re.compile(re.escape(query[0]) + "".join(f"[^{re.escape(c)}\n]*{re.escape(c)}" for c in query[1:]))
+        keys = self.keys
+        state = self._fuzzy_state
+        if state is not None and query.startswith(state[0]):
+            ids = [i for i in state[1] if pattern.search(keys[i])]
+            end = state[2]
+        else:
+            ids, end = [], 0
+        new = sum(1 for i in ids if i not in exclude)
+
+        blob = self._blob
+        if new < FUZZY_BELOW and end < len(blob):
+            # stop on a line boundary, so no line is half scanned
+            stop = blob.find("\n", end + FUZZY_SCAN_CHARS)
+            stop = len(blob) if stop < 0 else stop + 1
+            for match in pattern.finditer(blob, end, stop):
+                i = self._line_of(match.start())
+                if ids and ids[-1] == i:
+                    continue
+                ids.append(i)
+                if i not in exclude:
+                    new += 1
+                    if new >= FUZZY_BELOW:
+                        stop = self._line_starts[i + 1] if i + 1 < len(keys) else len(blob)
+                        break
+            end = stop
+        self._fuzzy_state = (query, ids, end)
+        return [i for i in ids if i not in exclude]
+
+    def _same_site(self, url: str) -> list[int]:
+        """Ids of the items whose site is `url`'s site by identity: same host, else same registrable domain."""
+        wanted = siteIdentity.identity_keys(url)
+        if not wanted:
+            return []
+        # a site that shares a key holds the last (least specific) one as whole labels,
+        # so only lines with it can match; the regex runs over all keys in C
+        # (the label start is checked by a lookbehind after the literal, so the engine can skip ahead)
+        name = re.escape(wanted[-1])
+        needle = re.compile(name + r"(?<![\w-]" + name + r")(?![\w-])")
+        lines = []
+        for match in needle.finditer(self._blob):
+            i = self._line_of(match.start())
+            if not lines or lines[-1] != i:
+                lines.append(i)
+
+        best, found = len(wanted), []
+        for i in lines:
+            item = self.items[i]
+            site = item.get(self.site_field) if isinstance(item, dict) else None
+            if not site:
+                continue
+            keys = self._site_keys.get(site)
+            if keys is None:
+                keys = self._site_keys[site] = siteIdentity.identity_keys(site)
+            level = next((n for n, key in enumerate(wanted) if key in keys), None)
+            if level is None or level > best:
+                continue
+            if level < best:
+                best, found = level, []
+            found.append(i)
+        return found
+
+    def search(self, query: str, limit: int | None = SHORT_LIMIT) -> list:
+        """Return the items matching `query`, best first; every item for an empty query.
+
+        Broad queries (see _substring) return at most `limit` items (all with None).
+        """
+        return self.search_page(query, limit)[0]
+
+    def search_page(self, query: str, limit: int | None = SHORT_LIMIT) -> tuple[list, bool]:
+        """Like `search`, plus whether `limit` left out matches of a broad query (the UI then offers to show all)."""
+        host = siteIdentity.host_of(query)
+        url = host is not None
+        same_site = self._same_site(query) if url else []
+        # a URL being typed ("https://www.github.c") has no known site yet; its host still matches as text
+        query = normalize(host if url and not same_site else query)
+        if not query:
+            self._last_query, self._last_matches = "", None
+            return list(self.items), False
+
+        matches = self._substring(query)
+        if matches is None:
+            # most labels match: unless every match is asked for, stop scanning after `limit`
+            ranked = list(same_site)
+            first = set(ranked)
+            prefixed = self._prefixed(query)
+            ranked.extend(i for i in (prefixed if limit is None else prefixed[:limit + 1]) if i not in first)
+            first.update(ranked)
+            rest = (i for i, key in enumerate(self.keys) if query in key and i not in first)
+            ranked.extend(rest if limit is None else islice(rest, max(0, limit + 1 - len(ranked))))
+            # a capped list cannot narrow the next query
+            self._last_query, self._last_matches = "", None
+            items = self.items
+            more = limit is not None and len(ranked) > limit
+            return [items[i] for i in (ranked[:limit] if more else ranked)], more
+
+        prefixed = self._prefixed(query)
+        self._last_query, self._last_matches = query, matches
+
+        ranked = list(same_site)
+        first = set(ranked)
+        ranked.extend(i for i in prefixed if i not in first)
+        first.update(prefixed)
+        ranked.extend(i for i in matches if i not in first)
+        # a pasted URL is matched by its site, not by its characters in order
+        if not url and len(query) >= FUZZY_MIN_LENGTH and len(ranked) < FUZZY_BELOW:
+            ranked.extend(self._fuzzy(query, set(ranked)))
+        items = self.items
+        return [items[i] for i in ranked], False
@@ -0,0 +1,107 @@
+# Functions/session.py
+# Holds the unlocked vault key in memory so the KDF runs once per unlock instead of once per field.
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from Functions.kdf import derive_key, LEGACY_PARAMS
+from Functions.salt import load_or_create_salt
+
+
+class VaultSession:
+    """An unlocked vault.
+
+    Created once in `EnterPasswordScreen` and passed to every `manager`
+    function in place of the raw master password. The derived key lives
+    only in memory for the lifetime of the app.
+
+    Entries are encrypted with a random data key. The master password only
+    derives the key-encryption key that wraps it (stored as "dek" in
+    config.json), so changing the password re-wraps 32 bytes instead of
+    rewriting the vault.
+    """
+
+    def __init__(self, key: bytes, kdf_params: dict | None = None, kek: bytes | None = None):
+        self.fernet = Fernet(key)
+        self.kdf_params = kdf_params
+        # encrypted username token -> plaintext, filled lazily for the site list screens
+        self.label_cache: dict[str, str] = {}
+        self._key = key
+        # vaults from before envelope encryption use the derived key for both roles
+        self._kek = Fernet(kek if kek is not None else key)
+
+    @staticmethod
+    def _derive(master_password: str, salt: bytes | None, params: dict | None) -> tuple[bytes, dict]:
+        if not master_password:
+            raise ValueError("master_password is required")
+        if salt is None:
+            salt = load_or_create_salt()
+        params = dict(params or LEGACY_PARAMS)
+        return derive_key(master_password, salt, params), params
+
+    @classmethod
+    def unlock(cls, master_password: str, salt: bytes | None = None, params: dict | None = None,
+               wrapped_key: str | None = None) -> "VaultSession":
+        """Derive the key-encryption key from `master_password` and unwrap the data key.
+
+        `params` are the KDF params from the vault header; None means legacy PBKDF2.
+        Without a `wrapped_key` the derived key itself encrypts the entries (pre-envelope vault).
+        Raises ValueError if the data key cannot be unwrapped.
+        """
+        kek, params = cls._derive(master_password, salt, params)
+        if wrapped_key is None:
+            return cls(kek, params)
+        try:
+            key = Fernet(kek).decrypt(wrapped_key.encode())
+        except InvalidToken as exc:
+            raise ValueError("Decryption failed: wrong master password") from exc
+        return cls(key, params, kek)
+
+    @classmethod
+    def create(cls, master_password: str, salt: bytes | None = None, params: dict | None = None) -> "VaultSession":
+        """Start a new vault with a random data key wrapped by `master_password`."""
+        kek, params = cls._derive(master_password, salt, params)
+        return cls(Fernet.generate_key(), params, kek)
+
+    def wrapped_key(self) -> str:
+        """Return the data key encrypted under the key-encryption key, for config.json."""
+        return self._kek.encrypt(self._key).decode("utf-8")
+
+    def hello_token(self) -> str:
+        """Return a fresh hello token for config.json, made with the key-encryption key."""
+        return self._kek.encrypt(b"hello").decode("utf-8")
+
+    def rewrap(self, new_master_password: str, salt: bytes | None = None, params: dict | None = None):
+        """Switch the key-encryption key to one derived from `new_master_password`.
+
+        The data key (and so every stored entry) stays the same; callers
+        persist `wrapped_key()`, `hello_token()` and `kdf_params` afterwards.
+        """
+        kek, params = self._derive(new_master_password, salt, params)
+        self._kek = Fernet(kek)
+        self.kdf_params = params
+
+    def derive_subkey(self, info: bytes, length: int = 32) -> bytes:
+        """Derive an independent raw key for another purpose (e.g. binary vault records) from the data key."""
+        return HKDF(algorithm=hashes.SHA256(), length=length, salt=None, info=info).derive(self._key)
+
+    def encrypt(self, message: str) -> str:
+        """Encrypt `message` with the session key and return the token as text."""
+        return self.fernet.encrypt(message.encode()).decode("utf-8")
+
+    def decrypt(self, token: str) -> str:
+        """Decrypt `token` with the session key.
+
+        Raises ValueError if the token is invalid or was made with another key.
+        """
+        try:
+            plaintext = self.fernet.decrypt(token.encode())
+        except (InvalidToken, AttributeError, TypeError) as exc:
+            raise ValueError("Decryption failed: invalid token or wrong master password") from exc
+        return plaintext.decode("utf-8")
+
+    def check(self, hello_token: str) -> None:
+        """Raise ValueError unless `hello_token` was made with this session's master password."""
+        try:
+            self._kek.decrypt(hello_token.encode())
+        except (InvalidToken, AttributeError, TypeError) as exc:
+            raise ValueError("Decryption failed: wrong master password") from exc
@@ -0,0 +1,245 @@
+# siteIdentity.py
+# Canonical identity of a site name: the host of a URL, its registrable domain (Public Suffix List) and its bare name.
+#
+# Sites are stored under whatever name was typed or imported ("GitHub",
+# "github.com", "https://gist.github.com/x"). `site_keys` maps each of
+# them to the keys it is filed under and `identity_keys` a lookup to the
+# keys it tries, most specific first; SiteIndex keeps key -> site names so
+# a URL or name lookup is a dict hit per key. A bare name ("GitHub") finds
+# a domain by its name, but a URL is never matched by name alone, since
+# "paypal.co" and "google.de" are other sites than "paypal.com" and
+# "google.com".
+# The suffix list is a gzip snapshot in assets/, read on the first call
+# that needs it.
+import gzip
+import ipaddress
+import re
+import sys
+from urllib.parse import urlsplit
+from Functions import fileManager
+
+SUFFIX_FILE = "public_suffix.dat.gz"
+
+# A value holding any of these is a URL, not a bare domain
+_URL_CHARS = re.compile(r"[\s/:@?#\[\]]")
+
+# Public Suffix List rules as written in the list ("co.uk", "*.ck", "!www.ck"),
+# and every trailing part of a rule ("uk", "co.uk", "ck", "www.ck"): a host
+# whose trailing part is not in the second set can match no longer rule
+_rules: frozenset[str] | None = None
+_tails: frozenset[str] = frozenset()
+
+
+def _suffix_rules() -> frozenset[str]:
+    global _rules, _tails
+    if _rules is None:
+        with gzip.open(fileManager.bundled_path(SUFFIX_FILE), "rt", encoding="utf-8") as f:
+            rules = frozenset(line.strip() for line in f if line.strip() and not line.startswith("//"))
+        tails = set()
+        for rule in rules:
+            labels = rule.lstrip("!").removeprefix("*.").split(".")
+            tails.update(".".join(labels[i:]) for i in range(len(labels)))
+        _rules, _tails = rules, frozenset(tails)
+    return _rules
+
+
+def preload():
+    """Read the suffix list now, e.g. while a UI is being built, rather than on the first lookup."""
+    _suffix_rules()
+
+
+def normalize(text: str) -> str:
+    """Case-fold `text` and collapse runs of whitespace (the key of a name that is not a URL)."""
+    return " ".join((text or "").casefold().split())
+
+
+def host_of(value: str) -> str | None:
+    """Return the lower-case host of a URL or domain ("https://www.GitHub.com/login" -> "github.com").
+
+    None if `value` is not one (e.g. "My Bank" or "GitHub"). Punycode labels
+    are decoded so they compare equal to the Unicode form.
+    """
+    value = (value or "").strip()
+    if "://" in value:
+        host = urlsplit(value).hostname
+    elif "." in value and not _URL_CHARS.search(value):
+        # a bare domain, the common case; urlsplit would only lower-case it
+        host = value.lower()
+    elif value and " " not in value and "." in value:
+        # "example.com/login" without a scheme
+        host = urlsplit("//" + value).hostname
+    else:
+        return None
+    host = (host or "").rstrip(".")
+    if host.startswith("www."):
+        host = host[4:]
+    if "xn--" in host:
+        try:
+            host = host.encode("ascii").decode("idna")
+        except UnicodeError:
+            pass
+    return host or None
+
+
+def _is_ip(host: str) -> bool:
+    if not (host[-1:].isdigit() or ":" in host):
+        # no top-level domain ends in a digit
+        return False
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+def public_suffix(host: str) -> str:
+    """Return the public suffix of `host` ("co.uk" for "mail.example.co.uk"), by the longest matching rule."""
+    rules = _suffix_rules()
+    labels = host.split(".")
+    # no rule: the top-level label is the suffix
+    suffix = candidate = labels[-1]
+    # grow the candidate a label at a time from the right while some rule is at least that long
+    for i in range(len(labels) - 1, -1, -1):
+        if i < len(labels) - 1:
+            candidate = f"{labels[i]}.{candidate}"
+        if "!" + candidate in rules:
+            # an exception overrides the wildcard that covers it
+            return candidate.split(".", 1)[1]
+        if candidate in rules:
+            suffix = candidate
+        elif i > 0 and "*." + candidate in rules:
+            suffix = f"{labels[i - 1]}.{candidate}"
+        if candidate not in _tails:
+            break
+    return suffix
+
+
+def registrable_domain(host: str) -> str:
+    """Return the domain one label below the public suffix ("example.co.uk" for "mail.example.co.uk").
+
+    IP addresses, single labels and bare suffixes are returned unchanged.
+    """
+    if "." not in host or _is_ip(host):
+        return host
+    return _registrable(host, public_suffix(host))[0]
+
+
+def _registrable(host: str, suffix: str) -> tuple[str, str]:
+    """(registrable domain, its name without the suffix) of `host` whose public suffix is `suffix`."""
+    if suffix == host:
+        return host, ""
+    owner = host[:-len(suffix) - 1].rsplit(".", 1)[-1]
+    return f"{owner}.{suffix}", owner
+
+
+def identity_keys(value: str) -> list[str]:
+    """Return the keys `value` is looked up by, most specific first.
+
+    A URL or domain gives its host and its registrable domain
+    ("https://mail.google.co.uk/" -> ["mail.google.co.uk", "google.co.uk"]);
+    any other name gives its normalized form ("GitHub" -> ["github"]).
+    A host never falls back to its bare name: "paypal.co" is not "paypal.com".
+    """
+    host = host_of(value)
+    if host is None:
+        key = normalize(value)
+        return [key] if key else []
+    if "." not in host or _is_ip(host):
+        return [host]
+    domain, _ = _registrable(host, public_suffix(host))
+    return [host] if domain == host else [host, domain]
+
+
+def site_keys(value: str) -> list[str]:
+    """Return the keys a stored site is filed under: its identity_keys, then the bare name of a domain.
+
+    The name ("github" for "github.com") lets a plain name such as "GitHub"
+    find the stored domain; a URL is only looked up by host and domain.
+    """
+    keys = identity_keys(value)
+    host = host_of(value)
+    if host is not None and "." in host and not _is_ip(host):
+        name = _registrable(host, public_suffix(host))[1]
+        if name:
+            keys.append(name)
+    return keys
+
+
+def canonical_site(value: str) -> str:
+    """Return the most specific identity key of `value` ("" for an empty name)."""
+    keys = identity_keys(value)
+    return keys[0] if keys else ""
+
+
+class SiteIndex:
+    """Identity key -> stored site names, kept in step with the vault by `add` and `remove`.
+
+    `lookup(value)` answers with the sites under the most specific key of
+    `value` that has any, so an exact host beats a shared domain. A plain
+    name matches the sites of that name (see site_keys). Within a key, a
+    site whose normalized name is the normalized `value` comes first, then
+    sites whose own most specific key is that key, each group in
+    case-folded name order.
+    """
+
+    def __init__(self, sites=()):
+        self._sites: dict[str, list[str]] = {}
+        # site -> its keys, so removal needs no suffix lookups
+        self._keys: dict[str, list[str]] = {}
+        for site in sites:
+            self.add(site)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, site: str):
+        if site in self._keys:
+            return
+        keys = self._keys[site] = site_keys(site)
+        for key in keys:
+            self._sites.setdefault(key, []).append(site)
+
+    def remove(self, site: str):
+        for key in self._keys.pop(site, ()):
+            sites = self._sites[key]
+            sites.remove(site)
+            if not sites:
+                del self._sites[key]
+
+    def lookup(self, value: str) -> list[str]:
+        """Return the stored sites that `value` (a URL, domain or name) refers to, best match first."""
+        wanted = normalize(value)
+        for key in identity_keys(value):
+            sites = self._sites.get(key)
+            if sites:
+                # "GitHub" is a closer match for "Github" than "github.com" filed under its
+                # name, and "github.com" for "https://github.com" than "gist.github.com"
+                return sorted(sites, key=lambda site: (normalize(site) != wanted, self._keys[site][0] != key,
+                                                       site.casefold(), site))
+        return []
+
+
+def write_snapshot(source, target=None) -> int:
+    """Compress a downloaded public_suffix_list.dat into the bundled snapshot. Returns the number of rules."""
+    with open(source, encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    notice = [line for line in lines[:3] if line.startswith("//")]
+    rules = [line for line in lines if line and not line.startswith("//")]
+    target = target if target is not None else fileManager.bundled_path(SUFFIX_FILE)
+    payload = gzip.compress("\n".join(notice + rules).encode("utf-8") + b"\n", 9, mtime=0)
+    fileManager.write_atomic(target, payload)
+    return len(rules)
+
+
+def main(argv=None) -> int:
+    """`python -m Functions.siteIdentity update <public_suffix_list.dat>` refreshes the bundled snapshot."""
+    args = sys.argv[1:] if argv is None else argv
+    if len(args) != 2 or args[0] != "update":
+        print("usage: python -m Functions.siteIdentity update <public_suffix_list.dat>")
+        return 2
+    print(f"{write_snapshot(args[1])} rules written to {fileManager.bundled_path(SUFFIX_FILE)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+# vaultConfig.py
+# Reads and writes the vault header (Data/config.json): hello token, KDF parameters, storage mode and schema version.
+import json
+from Functions import fileManager
+from Functions.kdf import LEGACY_PARAMS
+
+CONFIG_PATH = fileManager.data_path("config.json")
+
+# Storage engine for the entries (see storage.ENGINES): password.json rewritten on every change,
+# password.json plus an append-only journal, a SQLite database, or bucket files under Data/shards
+STORAGE_JSON = "json"
+STORAGE_JOURNAL = "journal"
+STORAGE_SQLITE = "sqlite"
+STORAGE_SHARDED = "sharded"
+STORAGE_MODES = (STORAGE_JSON, STORAGE_JOURNAL, STORAGE_SQLITE, STORAGE_SHARDED)
+
+
+def load_config() -> dict:
+    """Return the vault header, or an empty dict if it is missing or unreadable."""
+    if not CONFIG_PATH.exists():
+        return {}
+    try:
+        return json.loads(CONFIG_PATH.read_text(encoding="utf-8")) or {}
+    except Exception:
+        return {}
+
+
+def save_config(config: dict):
+    CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
+    CONFIG_PATH.write_text(json.dumps(config), encoding="utf-8")
+
+
+def get_kdf_params(config: dict) -> dict:
+    """Return the KDF params recorded in `config` (legacy PBKDF2 if none were stored)."""
+    return dict(config.get("kdf") or LEGACY_PARAMS)
+
+
+def get_storage_mode(config: dict) -> str:
+    """Return the storage mode recorded in `config` ("json" if none was stored)."""
+    mode = config.get("storage")
+    return mode if mode in STORAGE_MODES else STORAGE_JSON
+
+
+def store_session_keys(config: dict, session) -> dict:
+    """Record `session`'s hello token, wrapped data key and KDF params in `config`."""
+    config["hello"] = session.hello_token()
+    config["dek"] = session.wrapped_key()
+    config["kdf"] = session.kdf_params
+    return config
@@ -0,0 +1,140 @@
+# vaultFormat.py
+# Optional compact binary vault format: a versioned header followed by length-prefixed AEAD records.
+#
+# Layout (big-endian):
+#   header : magic "VMLN" | format version u8 | cipher id u8 | reserved u16 | record count u32
+#   record : body length u32 | site length u16 | site (utf-8) | nonce (12 bytes) | ciphertext + tag
+#
+# One record per credential. The plaintext is the same compact {"u", "p"} record
+# v2 JSON entries use, and the site name is bound to it as associated data.
+import os
+import struct
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+
+MAGIC = b"VMLN"
+FORMAT_VERSION = 1
+# In-memory entry version for records loaded from a binary vault
+ENTRY_VERSION = 3
+
+CIPHER_AESGCM = 1
+CIPHER_CHACHA20 = 2
+CIPHERS = {
+    CIPHER_AESGCM: AESGCM,
+    CIPHER_CHACHA20: ChaCha20Poly1305,
+}
+
+HEADER = struct.Struct(">4sBBHI")
+BODY_LEN = struct.Struct(">I")
+SITE_LEN = struct.Struct(">H")
+NONCE_SIZE = 12
+
+# HKDF info used to derive the record key from the session data key
+KEY_INFO = b"VaultMLN binary vault v1"
+
+
+def is_binary(raw: bytes) -> bool:
+    return raw[:len(MAGIC)] == MAGIC
+
+
+def is_binary_file(path) -> bool:
+    """Return True if the file at `path` starts with the binary vault magic."""
+    try:
+        with open(path, "rb") as f:
+            return is_binary(f.read(len(MAGIC)))
+    except FileNotFoundError:
+        return False
+
+
+def read_cipher_id(path) -> int:
+    """Return the cipher id stored in the header of the binary vault at `path` (AES-GCM if unknown)."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(HEADER.size)
+        return HEADER.unpack(head)[2] if is_binary(head) and len(head) == HEADER.size else CIPHER_AESGCM
+    except (FileNotFoundError, struct.error):
+        return CIPHER_AESGCM
+
+
+def make_aead(session, cipher_id: int = CIPHER_AESGCM):
+    """Return the AEAD object for `cipher_id`, keyed from the session's data key."""
+    cls = CIPHERS.get(cipher_id)
+    if cls is None:
+        raise ValueError(f"Unknown binary vault cipher id: {cipher_id}")
+    return cls(session.derive_subkey(KEY_INFO))
+
+
+def seal(aead, site: str, plaintext: str) -> dict:
+    """Encrypt one credential record for `site` and return it as an in-memory v3 entry."""
+    nonce = os.urandom(NONCE_SIZE)
+    ct = aead.encrypt(nonce, plaintext.encode("utf-8"), site.encode("utf-8"))
+    return {"v": ENTRY_VERSION, "nonce": nonce, "ct": ct}
+
+
+def open_entry(aead, site: str, entry: dict) -> str | None:
+    """Decrypt a v3 entry of `site`; returns None if it is corrupt or from another key."""
+    try:
+        return aead.decrypt(entry["nonce"], entry["ct"], site.encode("utf-8")).decode("utf-8")
+    except (InvalidTag, KeyError, TypeError, ValueError):
+        return None
+
+
+def parse(raw: bytes) -> tuple[int, dict]:
+    """Parse a binary vault into (cipher id, {site: [v3 entry, ...]}).
+
+    Nonces and ciphertexts are `memoryview` slices of `raw`, so nothing is
+    copied until a record is actually decrypted.
+    Raises ValueError on a malformed file.
+    """
+    view = memoryview(raw)
+    if len(view) < HEADER.size:
+        raise ValueError("Binary vault is truncated")
+    magic, version, cipher_id, _, count = HEADER.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a binary vault")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported binary vault version: {version}")
+
+    data: dict = {}
+    pos = HEADER.size
+    try:
+        for _ in range(count):
+            (body_len,) = BODY_LEN.unpack_from(view, pos)
+            pos += BODY_LEN.size
+            end = pos + body_len
+            (site_len,) = SITE_LEN.unpack_from(view, pos)
+            site_start = pos + SITE_LEN.size
+            nonce_start = site_start + site_len
+            ct_start = nonce_start + NONCE_SIZE
+            if ct_start > end or end > len(view):
+                raise ValueError("Binary vault record is truncated")
+            site = bytes(view[site_start:nonce_start]).decode("utf-8")
+            data.setdefault(site, []).append({
+                "v": ENTRY_VERSION,
+                "nonce": view[nonce_start:ct_start],
+                "ct": view[ct_start:end],
+            })
+            pos = end
+    except struct.error as exc:
+        raise ValueError("Binary vault record is truncated") from exc
+    return cipher_id, data
+
+
+def serialize(data: dict, cipher_id: int = CIPHER_AESGCM) -> bytes:
+    """Serialize {site: [v3 entry, ...]} into the binary vault layout."""
+    parts: list = []
+    count = 0
+    for site, entries in data.items():
+        site_bytes = site.encode("utf-8")
+        for entry in entries if isinstance(entries, list) else [entries]:
+            if entry.get("v") != ENTRY_VERSION:
+                raise ValueError(f"Entry for {site!r} is not a binary vault record")
+            nonce, ct = entry["nonce"], entry["ct"]
+            body_len = SITE_LEN.size + len(site_bytes) + NONCE_SIZE + len(ct)
+            parts.append(BODY_LEN.pack(body_len))
+            parts.append(SITE_LEN.pack(len(site_bytes)))
+            parts.append(site_bytes)
+            parts.append(nonce)
+            parts.append(ct)
+            count += 1
+    return HEADER.pack(MAGIC, FORMAT_VERSION, cipher_id, 0, count) + b"".join(parts)
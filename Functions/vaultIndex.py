@@ -0,0 +1,101 @@
+# vaultIndex.py
+# Sidecar offset index for password.json, so one site can be read without parsing the whole vault.
+#
+# Layout of password.json.idx (big-endian):
+#   header : magic "VIDX" | version u8 | pad 3 | vault mtime_ns u64 | vault size u64 | vault inode u64 | count u32
+#   record : site hash u64 | start u64 | key length u32 | length u32      (sorted by hash)
+#
+# `start`/`length` cover the '"site": [...]' member of the JSON object; the
+# first `key length` bytes are the JSON-encoded site name. The index is only
+# trusted while the vault's (mtime_ns, size, inode) match the header.
+import hashlib
+import json
+import mmap
+import struct
+
+MAGIC = b"VIDX"
+VERSION = 1
+HEADER = struct.Struct(">4sB3xQQQI")
+RECORD = struct.Struct(">QQII")
+
+_ENCODER = json.JSONEncoder(indent=4)
+
+# Returned by lookup() when the index cannot answer (missing, stale or corrupt)
+UNKNOWN = object()
+
+
+def _site_hash(site: str) -> int:
+    return int.from_bytes(hashlib.blake2b(site.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def serialize(data: dict) -> tuple[bytes, list[tuple[int, int, int, int]]]:
+    """Serialize the vault exactly like json.dumps(data, indent=4) and return (payload, index records)."""
+    if not data:
+        return b"{}", []
+    parts: list[str] = []
+    records: list[tuple[int, int, int, int]] = []
+    pos = 2  # after "{\n"
+    for site, entries in data.items():
+        # '    "site": [...]' exactly as it appears inside the full dump
+        key = json.dumps(site)
+        member = f"    {key}: " + _ENCODER.encode(entries).replace("\n", "\n    ")
+        key_len = len(key)
+        # the default ensure_ascii output is pure ASCII, so characters are bytes
+        records.append((_site_hash(site), pos + 4, key_len, len(member) - 4))
+        parts.append(member)
+        pos += len(member) + 2  # ",\n"
+    payload = "{\n" + ",\n".join(parts) + "\n}"
+    records.sort()
+    return payload.encode("ascii"), records
+
+
+def build(records: list[tuple[int, int, int, int]], stamp: tuple[int, int, int]) -> bytes:
+    """Return the index file contents for `records` of the vault with `stamp` (mtime_ns, size, inode)."""
+    mtime_ns, size, inode = stamp
+    return HEADER.pack(MAGIC, VERSION, mtime_ns, size, inode, len(records)) + b"".join(
+        RECORD.pack(*record) for record in records)
+
+
+def lookup(index_path, vault_path, site: str, stamp: tuple[int, int, int] | None):
+    """Return the entries of `site` read through the index, None if it is not in the vault,
+    or UNKNOWN if the index does not match the vault with `stamp`.
+
+    Both files are memory-mapped; only the records visited by the binary
+    search and the JSON slice of the site itself are read.
+    """
+    if stamp is None:
+        return UNKNOWN
+    try:
+        with open(index_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as idx:
+            if len(idx) < HEADER.size:
+                return UNKNOWN
+            magic, version, mtime_ns, size, inode, count = HEADER.unpack_from(idx, 0)
+            if magic != MAGIC or version != VERSION or (mtime_ns, size, inode) != tuple(stamp):
+                return UNKNOWN
+            if len(idx) < HEADER.size + count * RECORD.size:
+                return UNKNOWN
+            target = _site_hash(site)
+            lo, hi = 0, count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if RECORD.unpack_from(idx, HEADER.size + mid * RECORD.size)[0] < target:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            candidates = []
+            while lo < count:
+                record = RECORD.unpack_from(idx, HEADER.size + lo * RECORD.size)
+                if record[0] != target:
+                    break
+                candidates.append(record)
+                lo += 1
+        if not candidates:
+            return None
+        with open(vault_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as vault:
+            for _, start, key_len, length in candidates:
+                if json.loads(vault[start:start + key_len]) == site:
+                    # skip '"site": '
+                    return json.loads(vault[start + key_len + 2:start + length])
+        return None
+    except (OSError, ValueError, struct.error):
+        return UNKNOWN
@@ -0,0 +1,52 @@
+# benchmarks/bench_backup.py
+# Backup snapshot cost of a one-site edit as the vault grows, and the time to rebuild the newest snapshot.
+# Snapshots are written on manager's backup thread: "commit" is what the caller waits for,
+# "+flush" also includes manager.flush (the queued snapshots and one password.json write).
+# Run from the repo root: python benchmarks/bench_backup.py
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Keep the benchmark away from the real vault
+os.environ["APPDATA"] = tempfile.mkdtemp(prefix="vaultmln-bench-")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from Functions import backup, manager
+from Functions.session import VaultSession
+
+SIZES = (1_000, 10_000, 50_000)
+EDITS = 20
+
+
+def backup_bytes() -> int:
+    return sum(p.stat().st_size for p in backup.BACKUP_DIR.rglob("*") if p.is_file())
+
+
+def main():
+    session = VaultSession.unlock("correct horse battery staple")
+    print("sites        commit       +flush   bytes/edit     restore")
+    for size in SIZES:
+        manager._write_password_file({
+            f"site{i}.example": [manager._encode_entry(f"site{i}.example", f"user{i}", f"pw-{i:08d}", session)]
+            for i in range(size)})
+        manager.flush()
+        before = backup_bytes()
+        start = time.perf_counter()
+        for i in range(EDITS):
+            manager.store_json(f"site{i * 37 % size}.example", f"extra{i}", "pw", session)
+        commit = (time.perf_counter() - start) / EDITS
+        manager.flush()
+        edit = (time.perf_counter() - start) / EDITS
+        grown = (backup_bytes() - before) / EDITS
+
+        start = time.perf_counter()
+        backup.load_snapshot()
+        rebuild = time.perf_counter() - start
+        print(f"{size:<8}  {commit * 1e3:7.2f} ms  {edit * 1e3:7.2f} ms  {grown:10.0f} B  {rebuild * 1e3:8.1f} ms")
+    manager.flush()
+
+
+if __name__ == "__main__":
+    main()
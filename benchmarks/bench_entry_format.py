@@ -0,0 +1,75 @@
+# benchmarks/bench_entry_format.py
+# File size and list-all latency for two-token (v1) entries vs single-token (v2) entries.
+# Run from the repo root: python benchmarks/bench_entry_format.py
+#
+# manager only reads the current schema (v1 vaults are upgraded once by
+# migrations), so the v1 side is timed with the two-token batch decode
+# that list_sites used for v1 entries before that.
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Keep the benchmark away from the real vault
+os.environ["APPDATA"] = tempfile.mkdtemp(prefix="vaultmln-bench-")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from Functions import encrypt, manager, migrations
+from Functions.session import VaultSession
+
+ENTRIES = 20_000
+RUNS = 3
+
+
+def v1_vault(session: VaultSession) -> dict:
+    users = encrypt.encrypt_many([f"user{i}@example.com" for i in range(ENTRIES)], session.fernet)
+    pwds = encrypt.encrypt_many([f"pw-{i:08d}" for i in range(ENTRIES)], session.fernet)
+    return {f"site{i}.example": [{"username": u, "password": p}] for i, (u, p) in enumerate(zip(users, pwds))}
+
+
+def v2_vault(session: VaultSession) -> dict:
+    return {f"site{i}.example": [manager._encode_entry(f"site{i}.example", f"user{i}@example.com",
+                                                       f"pw-{i:08d}", session)]
+            for i in range(ENTRIES)}
+
+
+def list_v1(session: VaultSession) -> dict:
+    """list_sites for a v1 vault: both tokens of every entry decrypted as one batch."""
+    data = manager._read_password_file()
+    layout = [(site, item) for site, entries in data.items() for item in entries]
+    plain = encrypt.decrypt_many([t for _, item in layout for t in migrations._legacy_tokens(item)], session.fernet)
+    result: dict = {}
+    for n, (site, _) in enumerate(layout):
+        result.setdefault(site, []).append({"user": plain[2 * n], "password": plain[2 * n + 1]})
+    return result
+
+
+def measure(data: dict, session: VaultSession, list_all) -> tuple[int, float]:
+    manager._write_password_file(data)
+    manager.flush()
+    size = manager.PASSWORD_FILE.stat().st_size
+    best = float("inf")
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        listed = list_all(session)
+        best = min(best, time.perf_counter() - start)
+    # both sides must really have decrypted every entry
+    unreadable = sum(entry["user"] is None for entries in listed.values() for entry in entries)
+    if unreadable:
+        raise SystemExit(f"{unreadable} entries were not decrypted")
+    return size, best
+
+
+def main():
+    session = VaultSession.unlock("correct horse battery staple")
+    size1, t1 = measure(v1_vault(session), session, list_v1)
+    size2, t2 = measure(v2_vault(session), session, manager.list_sites)
+    print(f"{ENTRIES} entries          file size     list_sites")
+    print(f"v1 (two tokens)   : {size1 / 1e6:8.2f} MB  {t1 * 1e3:9.1f} ms")
+    print(f"v2 (one token)    : {size2 / 1e6:8.2f} MB  {t2 * 1e3:9.1f} ms")
+    print(f"change            : {100 * (size2 - size1) / size1:+8.1f} %   {100 * (t2 - t1) / t1:+8.1f} %")
+
+
+if __name__ == "__main__":
+    main()
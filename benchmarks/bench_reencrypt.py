@@ -0,0 +1,74 @@
+# benchmarks/bench_reencrypt.py
+# Re-encrypts a synthetic 50k-entry vault: serial loop vs the chunked engine, plus an interrupted-and-resumed run.
+# Run from the repo root: python benchmarks/bench_reencrypt.py
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Keep the benchmark away from the real vault
+os.environ["APPDATA"] = tempfile.mkdtemp(prefix="vaultmln-bench-")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from cryptography.fernet import Fernet
+from Functions import encrypt, fileManager, reencrypt
+
+ENTRIES = 50_000
+
+
+class Interrupted(Exception):
+    pass
+
+
+def build_vault(path: Path, cipher: Fernet):
+    users = encrypt.encrypt_many([f"user{i}@example.com" for i in range(ENTRIES)], cipher)
+    pwds = encrypt.encrypt_many([f"pw-{i:08d}" for i in range(ENTRIES)], cipher)
+    data = {f"site{i}.example": [{"username": u, "password": p}] for i, (u, p) in enumerate(zip(users, pwds))}
+    path.write_text(json.dumps(data, indent=4), encoding="utf-8")
+
+
+def main():
+    fileManager.ensure_appdata_structure()
+    path = fileManager.data_path("password.json")
+    old, new = Fernet(Fernet.generate_key()), Fernet(Fernet.generate_key())
+    build_vault(path, old)
+    print(f"vault: {ENTRIES} entries, {path.stat().st_size / 1e6:.1f} MB")
+
+    # serial baseline: what the UI thread used to do
+    start = time.perf_counter()
+    data = json.loads(path.read_text(encoding="utf-8"))
+    out = {}
+    for site, entries in data.items():
+        out[site] = [{k: new.encrypt(old.decrypt(v.encode())).decode() for k, v in e.items()} for e in entries]
+    serial = time.perf_counter() - start
+    print(f"serial loop        : {serial:7.2f} s")
+
+    start = time.perf_counter()
+    reencrypt.reencrypt_file(old, new, path)
+    engine = time.perf_counter() - start
+    print(f"engine, {os.cpu_count():>2} cores  : {engine:7.2f} s  ({ENTRIES / engine:,.0f} entries/s)")
+
+    # interrupt halfway, then resume with the same target key
+    build_vault(path, old)
+
+    def stop_halfway(done, total):
+        if done >= total // 2:
+            raise Interrupted
+
+    try:
+        reencrypt.reencrypt_file(old, new, path, progress=stop_halfway)
+    except Interrupted:
+        pass
+    start = time.perf_counter()
+    stats = reencrypt.reencrypt_file(old, new, path)
+    resumed = time.perf_counter() - start
+    print(f"resume after crash : {resumed:7.2f} s  (picked up at entry {stats['resumed_at']})")
+
+    sample = json.loads(path.read_text(encoding="utf-8"))["site0.example"][0]
+    assert new.decrypt(sample["username"].encode()) == b"user0@example.com"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# benchmarks/bench_search.py
+# Per-keystroke SearchIndex.search latency on 100k random site labels, against a one-frame (16.7 ms) budget.
+# Run from the repo root: python benchmarks/bench_search.py
+import gc
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from Functions.searchIndex import SearchIndex
+
+LABELS = 100_000
+FRAME_MS = 1000 / 60
+TLDS = ("com", "net", "org", "io", "co.uk", "de")
+# typed one character at a time, the box cleared between words
+WORDS = ("netflix", "mail", "bank", "github", "amazon", "https://www.github.com/login", "qz")
+
+
+def random_labels(count: int) -> list[dict]:
+    rng = random.Random(1)
+    items = []
+    for i in range(count):
+        name = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 12)))
+        site = f"{name}.{rng.choice(TLDS)}"
+        user = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 8)))
+        items.append({"label": f"{site} | {user}", "site": site, "username": user})
+    # a few real names so the words have exact hits
+    for name in ("netflix.com", "github.com", "GitHub", "amazon.de", "mybank.co.uk"):
+        items.append({"label": name, "site": name, "username": None})
+    return items
+
+
+def main():
+    items = random_labels(LABELS)
+    start = time.perf_counter()
+    index = SearchIndex(items)
+    # the first full collection after allocating the labels is a cost of the build, not of a keystroke
+    gc.collect()
+    print(f"build: {(time.perf_counter() - start) * 1e3:.0f} ms for {len(items)} labels (with one full gc)")
+
+    times = []
+    print(f"{'query':<30} {'ms':>7} {'results':>8}")
+    for word in WORDS:
+        index.search("")
+        for n in range(1, len(word) + 1):
+            query = word[:n]
+            start = time.perf_counter()
+            found = index.search(query)
+            elapsed = (time.perf_counter() - start) * 1e3
+            times.append(elapsed)
+            flag = "  over" if elapsed > FRAME_MS else ""
+            print(f"{query:<30} {elapsed:7.2f} {len(found):8}{flag}")
+    times.sort()
+    over = sum(t > FRAME_MS for t in times)
+    print(f"{len(times)} keystrokes: p50 {times[len(times) // 2]:.2f} ms, max {times[-1]:.2f} ms, "
+          f"{over} over {FRAME_MS:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# benchmarks/bench_session.py
+# Compares per-entry decrypt cost with the old per-call KDF against an unlocked VaultSession.
+# Run from the repo root: python benchmarks/bench_session.py
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Keep the benchmark away from the real vault
+os.environ["APPDATA"] = tempfile.mkdtemp(prefix="vaultmln-bench-")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from cryptography.fernet import Fernet
+from Functions.kdf import derive_key
+from Functions.salt import load_or_create_salt
+from Functions.session import VaultSession
+
+MASTER = "correct horse battery staple"
+ENTRIES = 1000
+LEGACY_SAMPLES = 5
+
+
+def legacy_decrypt(token: str, master_password: str) -> str:
+    """The old encrypt.decrypt_message: salt read and KDF run again for every call."""
+    key = derive_key(master_password, load_or_create_salt())
+    return Fernet(key).decrypt(token.encode()).decode("utf-8")
+
+
+def main():
+    session = VaultSession.unlock(MASTER)
+    tokens = [session.encrypt(f"user{i}@example.com") for i in range(ENTRIES)]
+
+    start = time.perf_counter()
+    for token in tokens[:LEGACY_SAMPLES]:
+        legacy_decrypt(token, MASTER)
+    legacy = (time.perf_counter() - start) / LEGACY_SAMPLES
+
+    start = time.perf_counter()
+    for token in tokens:
+        session.decrypt(token)
+    cached = (time.perf_counter() - start) / ENTRIES
+
+    print(f"per-entry decrypt, KDF per call : {legacy * 1e3:10.2f} ms")
+    print(f"per-entry decrypt, VaultSession : {cached * 1e6:10.2f} us")
+    print(f"speedup                         : {legacy / cached:10.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# benchmarks/bench_shards.py
+# Write latency of one add (including the disk write) on a 50k-site vault: monolithic password.json vs sharded buckets.
+# Run from the repo root: python benchmarks/bench_shards.py
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Keep the benchmark away from the real vault
+os.environ["APPDATA"] = tempfile.mkdtemp(prefix="vaultmln-bench-")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from Functions import manager
+from Functions.session import VaultSession
+
+SITES = 50_000
+RUNS = 10
+
+
+def timed_adds(session: VaultSession, tag: str) -> float:
+    best = float("inf")
+    for i in range(RUNS):
+        start = time.perf_counter()
+        manager.store_json(f"{tag}{i}.example", "user", "pw", session)
+        manager.flush()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    session = VaultSession.unlock("correct horse battery staple")
+    data = {f"site{i}.example": [manager._encode_entry(f"site{i}.example", f"user{i}@example.com",
+                                                       f"pw-{i:08d}", session)]
+            for i in range(SITES)}
+    manager._write_password_file(data)
+    manager.flush()
+    size = manager.PASSWORD_FILE.stat().st_size
+
+    mono = timed_adds(session, "mono")
+    print(f"{SITES} sites, {size / 1e6:.1f} MB vault   store_json + flush")
+    print(f"password.json         : {mono * 1e3:9.2f} ms")
+    manager.set_storage_mode("sharded")
+    for count in (16, 64, 256):
+        manager.reshard(count)
+        sharded = timed_adds(session, f"shard{count}-")
+        print(f"{count:>3} shards             : {sharded * 1e3:9.2f} ms")
+    start = time.perf_counter()
+    manager._storage()._buckets.clear()  # cold read of every bucket
+    manager.list_site_names()
+    print(f"full scan, 256 shards : {(time.perf_counter() - start) * 1e3:9.2f} ms")
+    manager.set_storage_mode("json")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# benchmarks/bench_storage.py
+# Single-site lookup and insert latency on a 20k-site vault for each storage engine.
+# Run from the repo root: python benchmarks/bench_storage.py
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Keep the benchmark away from the real vault
+os.environ["APPDATA"] = tempfile.mkdtemp(prefix="vaultmln-bench-")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from Functions import manager, storage
+from Functions.session import VaultSession
+
+SITES = 20_000
+RUNS = 20
+
+
+def timed(func) -> float:
+    best = float("inf")
+    for i in range(RUNS):
+        start = time.perf_counter()
+        func(i)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    session = VaultSession.unlock("correct horse battery staple")
+    data = {f"site{i}.example": [manager._encode_entry(f"site{i}.example", f"user{i}@example.com",
+                                                       f"pw-{i:08d}", session)]
+            for i in range(SITES)}
+    manager._write_password_file(data)
+
+    print(f"{SITES} sites       get_data      store_json")
+    for mode in storage.ENGINES:
+        manager.set_storage_mode(mode)
+        get = timed(lambda i: manager.get_data(f"site{i * 997 % SITES}.example", session))
+        put = timed(lambda i: manager.store_json(f"new{mode}{i}.example", "user", "pw", session))
+        print(f"{mode:<8}      : {get * 1e3:9.2f} ms  {put * 1e3:9.2f} ms")
+    manager.set_storage_mode("json")
+
+
+if __name__ == "__main__":
+    main()
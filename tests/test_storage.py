@@ -0,0 +1,47 @@
+# tests/test_storage.py
+# Regression tests for the write-behind cache of FileStorage and the sharded manifest.
+import json
+from Functions import storage
+
+
+def test_write_before_first_read_survives_read_and_flush(tmp_path):
+    path = tmp_path / "password.json"
+    path.write_text(json.dumps({"old.com": []}))
+    # a long delay keeps the timer out of the way; the test flushes by hand
+    engine = storage.FileStorage(path, flush_delay=60)
+
+    engine.write_all({"a.com": []})
+    # the unsaved write must win over the (older) file on disk
+    assert engine.site_names() == ["a.com"]
+    assert engine.get_site("old.com") is None
+
+    engine.flush()
+    assert json.loads(path.read_text()) == {"a.com": []}
+    assert storage.FileStorage(path).load() == {"a.com": []}
+
+
+def test_read_after_flush_sees_later_writes(tmp_path):
+    path = tmp_path / "password.json"
+    engine = storage.FileStorage(path, flush_delay=60)
+
+    engine.write_all({"a.com": []})
+    engine.flush()
+    engine.apply_sites({"b.com": [], "a.com": None})
+    assert engine.site_names() == ["b.com"]
+    engine.close()
+    assert json.loads(path.read_text()) == {"b.com": []}
+
+
+def test_sharded_rebuilds_a_truncated_manifest(tmp_path):
+    engine = storage.ShardedStorage(tmp_path / "shards", count=4)
+    engine.write_all({f"s{i}.com": [{"n": i}] for i in range(20)})
+    engine.apply_sites({"s1.com": [{"n": "new"}]})
+    manifest = tmp_path / "shards" / "manifest.json"
+    manifest.write_bytes(manifest.read_bytes()[:20])
+
+    engine = storage.ShardedStorage(tmp_path / "shards", count=4)
+    assert len(engine.load()) == 20
+    assert engine.get_site("s1.com") == [{"n": "new"}]
+    # the next write must not reuse a bucket file name
+    engine.apply_sites({"z.com": []})
+    assert len(storage.ShardedStorage(tmp_path / "shards").load()) == 21
@@ -35,8 +35,8 @@ class UI:
         # Content frame (full screen, swappable area)
         self.frame = ctk.CTkFrame(self.root, corner_radius=20)
 
-        # master password stored only in memory for this session
-        self.master_password = None
+        # unlocked VaultSession (derived key) stored only in memory for this session
+        self.session = None
 
         # default to password entry screen on startup
         self.show_screen("enter_password")
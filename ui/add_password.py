@@ -6,7 +6,7 @@ from PIL import Image
 from ui.popups import empty_fields_alert, password_mismatch_alert, simple_alert, confirm_replace
 from ui.helpers import create_title, divider, frame, add_buttons, create_label, get_colors, home_button, DEFAULT_FONT
 from Functions import fileManager
-from Functions.manager import store_json, list_sites, delete_site
+from Functions.manager import has_username, transaction
 
 
 class AddPasswordScreen:
@@ -77,20 +77,17 @@ class AddPasswordScreen:
             password_mismatch_alert(self.frame)
             return
         try:
-            # check for existing username on same site
-            sites = list_sites(self.ui.master_password)
-            existing = sites.get(site)
-            if existing:
-                # existing is a list of dicts with 'user' and 'password'
-                match = next((e for e in existing if e.get("user") == user), None)
+            # check for an entry with exactly this username (blind index narrows, then compared decrypted)
+            match = has_username(site, user, self.ui.session)
+            # ask user whether to replace
+            if match and not confirm_replace(self.frame, site, user):
+                return
+            # delete-then-store is committed as one write
+            with transaction(self.ui.session) as tx:
                 if match:
-                    # ask user whether to replace
-                    replace = confirm_replace(self.frame, site, user)
-                    if not replace:
-                        return
                     # delete only the matching entry
-                    deleted = delete_site(site, self.ui.master_password, username=user)
-            store_json(site, user, pw, self.ui.master_password)
+                    tx.delete(site, username=user)
+                tx.put(site, user, pw)
             self.ui.show_screen("home")
         except Exception as e:
             simple_alert(self.frame, "Error", f"Failed to store password: {e}")
@@ -3,81 +3,80 @@
 from customtkinter import CTkFrame, CTkEntry, CENTER
 import customtkinter as ctk
 from PIL import Image
-from ui.helpers import create_label, create_title, add_buttons, divider, frame, get_colors, home_button, DEFAULT_FONT, HOME_IMG, EYE_OPEN_IMG, EYE_CLOSED_IMG, EYE_CLOSED_IMG_LIGHT, EYE_OPEN_IMG_LIGHT
+from ui.helpers import create_label, create_title, add_buttons, divider, frame, get_colors, home_button, run_in_background, DEFAULT_FONT, HOME_IMG, EYE_OPEN_IMG, EYE_CLOSED_IMG, EYE_CLOSED_IMG_LIGHT, EYE_OPEN_IMG_LIGHT
 from Functions import fileManager
-from Functions.manager import list_sites, list_site_names, get_data, get_site_display_names
+from Functions.searchIndex import SearchIndex, SHORT_LIMIT
+from Functions.manager import list_sites, list_site_names, get_data, get_site_display_names, resolve_display_names, resolve_username
 from ui.popups import simple_alert
+from ui.virtualList import VirtualList
+from ui.searchScheduler import SearchScheduler
 import threading
 
 class SiteSearchWidget(CTkFrame):
-    """Search bar with an always-open scrollable list of CTkButton items.
+    """Search bar with an always-open, virtualized list of site buttons.
 
     - Calls `list_site_names()` once and keeps it in `self.all_sites`.
-    - Filters locally on <KeyRelease> and rebuilds the list of buttons.
-    - Calls `callback(site_name)` when a site button is clicked.
+    - Searches a SearchIndex of the labels on a worker, debounced after <KeyRelease> (see SearchScheduler),
+      and shows the result in a VirtualList.
+    - Calls `callback(button)` when a site button is clicked; the button carries `.site`, `.username` and `.item`.
     """
     def __init__(self, master, all_sites, callback, **kwargs):
         super().__init__(master, **kwargs)
-        self.btn_list = []
         # `all_sites` is a list of items: {"label","site","username"}
         self.all_sites = list(all_sites) if all_sites else []
+        self.index = SearchIndex(self.all_sites)
         self.callback = callback
-        self.site_widgets = []
+        # queries are (text, limit); limit None lists every match (the "show all" row)
+        self.scheduler = SearchScheduler(self, lambda query: self.index.search_page(*query), self._show_result)
         self.selected = None
         self.search_var = ctk.StringVar()
         self.entry = CTkEntry(self, textvariable=self.search_var, font=DEFAULT_FONT, placeholder_text="Search sites...")
         self.entry.pack(fill="x", padx=6, pady=(6, 4))
         self.entry.bind("<KeyRelease>", self._on_keyrelease)
-        self.scroll = ctk.CTkScrollableFrame(self)
-        self.scroll.pack(fill="both", expand=True, padx=6, pady=(0,6))
+        self.list = VirtualList(self, on_click=self._on_click)
+        self.list.pack(fill="both", expand=True, padx=6, pady=(0,6))
         # initial build
         self.rebuild_list(self.all_sites)
 
     def _on_keyrelease(self, event):
-        try:
-            text = self.search_var.get().lower()
-            if text == "":
-                filtered = list(self.all_sites)
-            else:
-                filtered = [item for item in self.all_sites if text in (item.get("label") or "").lower()]
-            if not filtered:
-                filtered = [{"label": "No sites found", "site": None, "username": None}]
-            self.rebuild_list(filtered)
-        except Exception:
-            # avoid crashing UI from unexpected input
-            self.rebuild_list([{"label": "No sites found", "site": None, "username": None}])
+        self.scheduler.submit((self.search_var.get(), SHORT_LIMIT))
+
+    def _show_result(self, result, error):
+        filtered, more = result if error is None else ([], False)
+        # an error (e.g. unexpected input) must not crash the UI
+        if not filtered:
+            filtered = [{"label": "No sites found", "site": None, "username": None}]
+        elif more:
+            # a broad query was cut short; the last row lists the rest on request
+            filtered = filtered + [{"label": f"Showing the first {len(filtered)} matches. Show all...",
+                                    "site": None, "username": None, "more": True}]
+        self.rebuild_list(filtered)
+
+    def set_items(self, items):
+        """Replace the full item list (e.g. once usernames are decrypted) and re-apply the current filter."""
+        self.all_sites = list(items) if items else []
+        self.index = SearchIndex(self.all_sites)
+        # a result from the old items must not replace the new ones
+        self.scheduler.invalidate()
+        self.scheduler.submit((self.search_var.get(), SHORT_LIMIT), delay_ms=0)
+
+    def destroy(self):
+        self.scheduler.close()
+        super().destroy()
 
     def rebuild_list(self, items):
-        # destroy old widgets
-        self.btn_list.clear()
-        for w in self.site_widgets:
-            try:
-                w.destroy()
-            except Exception:
-                pass
-        self.site_widgets.clear()
-        # build new buttons
-        for item in items:
-            label = item.get("label") if isinstance(item, dict) else str(item)
-            btn = ctk.CTkButton(self.scroll, text=label, anchor="w", fg_color="#3A3A3A", hover_color="#5C5C5C", font=DEFAULT_FONT, cursor="hand2")
-            # attach metadata to button
-            btn.site = item.get("site") if isinstance(item, dict) else None
-            btn.username = item.get("username") if isinstance(item, dict) else None
-
-            btn.configure(command=lambda b=btn: self._on_click(b))
-            self.btn_list.append(btn)
-            btn.pack(fill="x", pady=2, padx=2)
-            self.site_widgets.append(btn)
+        # rows are recycled, only their text and metadata change
+        self.list.set_items(items)
+
     def _on_click(self, button):
-        # new signature: pass button
-        for btn in self.btn_list:
-            btn.configure(fg_color="#3A3A3A", hover_color="#5C5C5C")
         # ignore placeholder
         if button.cget("text") == "No sites found":
             return
+        if button.item and button.item.get("more"):
+            self.scheduler.submit((self.search_var.get(), None), delay_ms=0)
+            return
         self.selected = button
-        button.configure(fg_color="#123456")
-        button.configure(hover_color="#22486E")
+        self.list.select(button.item)
         self.search_var.set(button.cget("text"))
         try:
             if callable(self.callback):
@@ -86,6 +85,17 @@ class SiteSearchWidget(CTkFrame):
             # swallow errors from callback to keep UI responsive
             pass
 
+def load_usernames(ui, items, search_widget):
+    """Decrypt pending multi-entry usernames on a worker and refresh `search_widget` when done."""
+    if not any(item.get("token") for item in items if isinstance(item, dict)):
+        return
+
+    def on_done(resolved, error):
+        if error is None and search_widget.winfo_exists():
+            search_widget.set_items(resolved)
+
+    run_in_background(ui.root, lambda: resolve_display_names(items, ui.session), on_done)
+
 class siteCheckScreen:
     def __init__(self, ui):
         self.ui = ui
@@ -107,7 +117,7 @@ class siteCheckScreen:
             self.tick_img = ctk.CTkImage(dark_image=Image.open(fileManager.asset_path("tick_mark.png")))
         self.frame.place(relx=0.5, rely=0.5, anchor = CENTER, relwidth=0.9, relheight=0.9)
         # load site names once and keep in memory while typing
-        self.sites_resp = get_site_display_names(self.ui.master_password)
+        self.sites_resp = get_site_display_names(self.ui.session)
         if self.sites_resp.get("ok"):
             self.site_items = self.sites_resp.get("items", [])
         else:
@@ -134,6 +144,8 @@ class siteCheckScreen:
         # Search widget: entry on top, scrollable list of CTkButton items below
         self.search_widget = SiteSearchWidget(self.frame, all_sites=self.site_names, callback=self.on_site_selected)
         self.search_widget.place(relx=0.5, rely=0.33, anchor=CENTER, relwidth=0.8, relheight=0.25)
+        # paint site names first, decrypt multi-entry usernames afterwards
+        load_usernames(self.ui, self.site_names, self.search_widget)
     
         self.get_data_button = add_buttons(self.frame, text="Get Data", command=self.check_site, colors_dict=self.colors)
         self.get_data_button.place(relx=0.5, rely=0.5, anchor=CENTER, relwidth=0.3)
@@ -172,7 +184,7 @@ class siteCheckScreen:
         if not selected_site:
             simple_alert(self.frame, "No selection", "Please select a site from the list first.")
             return
-        site_data = get_data(selected_site, self.ui.master_password)
+        site_data = get_data(selected_site, self.ui.session)
         if not site_data or not site_data.get("ok"):
             code = site_data.get('code') if isinstance(site_data, dict) else '??'
             message = site_data.get('message') if isinstance(site_data, dict) else 'Unknown error'
@@ -205,7 +217,7 @@ class siteCheckScreen:
             if not button:
                 return
             self.selected_site = button.site
-            self.selected_username = button.username
+            self.selected_username = button.username or resolve_username(getattr(button, "item", None), self.ui.session)
         except Exception:
             # keep UI stable if callback misbehaves
             self.selected_site = None
@@ -4,8 +4,8 @@ from customtkinter import CENTER
 import customtkinter as ctk
 from ui.popups import simple_alert, confirm_delete
 from ui.helpers import create_label, create_title, divider, add_buttons, get_colors, home_button, frame, DEFAULT_FONT
-from Functions.manager import delete_site, get_site_display_names
-from ui.checkSite import SiteSearchWidget
+from Functions.manager import delete_site, get_site_display_names, resolve_username, UNREADABLE_USERNAME
+from ui.checkSite import SiteSearchWidget, load_usernames
 
 
 class deletePasswordScreen:
@@ -30,7 +30,7 @@ class deletePasswordScreen:
         self.divider = divider(self.frame)
         self.divider.place(relx=0.5, rely=0.1, anchor=CENTER)
 
-        resp = get_site_display_names(self.ui.master_password)
+        resp = get_site_display_names(self.ui.session)
         if resp.get("ok"):
             self.site_items = resp.get("items", [])
         else:
@@ -38,6 +38,7 @@ class deletePasswordScreen:
 
         self.search_widget = SiteSearchWidget(self.frame, all_sites=self.site_items, callback=self.on_item_selected)
         self.search_widget.place(relx=0.5, rely=0.33, anchor=CENTER, relwidth=0.8, relheight=0.25)
+        load_usernames(self.ui, self.site_items, self.search_widget)
 
         self.delete_button = add_buttons(self.frame, text="Delete Selected", colors_dict=self.colors, command=self.confirm_and_delete)
         self.delete_button.place(relx=0.5, rely=0.5, anchor=CENTER, relwidth=0.4)
@@ -46,19 +47,21 @@ class deletePasswordScreen:
         self.status_label.place(relx=0.5, rely=0.65, anchor=CENTER)
 
     def refresh_list(self):
-        resp = get_site_display_names(self.ui.master_password)
+        resp = get_site_display_names(self.ui.session)
         if resp.get("ok"):
             self.site_items = resp.get("items", [])
         else:
             self.site_items = [{"label": "No sites found", "site": None, "username": None}]
-        self.search_widget.rebuild_list(self.site_items)
+        self.search_widget.search_var.set("")
+        self.search_widget.set_items(self.site_items)
+        load_usernames(self.ui, self.site_items, self.search_widget)
 
     def on_item_selected(self, button):
         try:
             if not button:
                 return
             self.selected_site = button.site
-            self.selected_username = button.username
+            self.selected_username = button.username or resolve_username(getattr(button, "item", None), self.ui.session)
             label = button.cget("text")
             self.status_label.configure(text=f"Selected: {label}")
         except Exception:
@@ -70,13 +73,17 @@ class deletePasswordScreen:
         if not self.selected_site:
             simple_alert(self.frame, "No selection", "Please select a site to delete.")
             return
+        if self.selected_username == UNREADABLE_USERNAME:
+            # deleting without a username would remove every entry of the site
+            simple_alert(self.frame, "Unreadable entry", "This entry's username cannot be read, so it cannot be deleted on its own.")
+            return
 
         confirmed = confirm_delete(self.frame, self.selected_site, self.selected_username)
         if not confirmed:
             return
 
         try:
-            deleted = delete_site(self.selected_site, self.ui.master_password, username=self.selected_username)
+            deleted = delete_site(self.selected_site, self.ui.session, username=self.selected_username)
             if deleted:
                 simple_alert(self.frame, "Deleted", "Entry deleted successfully.")
                 self.selected_site = None
@@ -1,17 +1,15 @@
 # enterPassword.py
 import customtkinter as ctk
 from customtkinter import CENTER
-from ui.helpers import create_title, create_label, add_buttons, divider, get_colors, DEFAULT_FONT
-from Functions.kdf import derive_key
-from Functions.salt import load_or_create_salt
-from Functions import encrypt, manager
+from ui.helpers import create_title, create_label, add_buttons, divider, get_colors, run_in_background, Spinner, DEFAULT_FONT
+from Functions.session import VaultSession
+from Functions.kdf import calibrate
+from Functions import vaultConfig, reencrypt, manager, migrations
 from cryptography.fernet import Fernet
-from pathlib import Path
-import json, os, threading, time
+import threading, time
 
 from Functions import fileManager
 
-CONFIG_PATH = fileManager.data_path("config.json")
 PASSWORD_PATH = fileManager.data_path("password.json")
 LEGACY_KEY = fileManager.data_path("secret.key")
 
@@ -25,29 +23,24 @@ class EnterPasswordScreen:
 
         self.attempts_left = 5
         self.locked_until = 0
+        self.busy = False
+        self.spinner = None
 
         self._load_config()
         self._build()
 
     def _load_config(self):
-        if CONFIG_PATH.exists():
-            try:
-                self.config = json.loads(CONFIG_PATH.read_text(encoding="utf-8"))
-            except Exception:
-                self.config = {}
-        else:
-            self.config = {}
+        self.config = vaultConfig.load_config()
 
     def _save_config(self):
-        CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
-        CONFIG_PATH.write_text(json.dumps(self.config), encoding="utf-8")
+        vaultConfig.save_config(self.config)
 
     def _has_passwords(self):
         if not PASSWORD_PATH.exists():
             return False
         try:
-            data = json.loads(PASSWORD_PATH.read_text(encoding="utf-8")) or {}
-            return bool(data)
+            # reads both the JSON and the binary vault format
+            return bool(manager.list_site_names())
         except Exception:
             return False
 
@@ -55,7 +48,9 @@ class EnterPasswordScreen:
         create_title(self.frame, "Unlock Vault").place(relx=0.5, rely=0.08, anchor=CENTER)
         divider(self.frame).place(relx=0.5, rely=0.15, anchor=CENTER)
 
-        if self.config.get("hello"):
+        # the widgets depend on the mode at build time; creating a vault stores "hello" before leaving this screen
+        self.creating = not self.config.get("hello")
+        if not self.creating:
             self.info_label = create_label(self.frame, "Enter master password to unlock.")
             self.info_label.place(relx=0.5, rely=0.25, anchor=CENTER)
 
@@ -70,8 +65,9 @@ class EnterPasswordScreen:
 
 
         # If no master password configured, show create fields
-        if not self.config.get("hello"):
-            create_label(self.frame, "No master password set. Create one below:").place(relx=0.5, rely=0.25, anchor=CENTER)
+        if self.creating:
+            self.info_label = create_label(self.frame, "No master password set. Create one below:")
+            self.info_label.place(relx=0.5, rely=0.25, anchor=CENTER)
             self.new_entry = ctk.CTkEntry(self.frame, show="*", font=DEFAULT_FONT, width=300, placeholder_text="New password")
             self.new_entry.place(relx=0.5, rely=0.33, anchor=CENTER)
             self.new_confirm = ctk.CTkEntry(self.frame, show="*", font=DEFAULT_FONT, width=300, placeholder_text="Confirm password")
@@ -79,7 +75,26 @@ class EnterPasswordScreen:
             self.create_btn = add_buttons(self.frame, "Create Master Password", command=self._create_master, colors_dict=self.colors)
             self.create_btn.place(relx=0.5, rely=0.5, anchor=CENTER, relwidth=0.5)
 
+    def _set_busy(self, busy: bool, text: str = ""):
+        """Disable input and animate the info label while the KDF runs off the Tk thread."""
+        self.busy = busy
+        state = "disabled" if busy else "normal"
+        if self.creating:
+            widgets = (self.new_entry, self.new_confirm, self.create_btn)
+        else:
+            widgets = (self.entry, self.submit_btn)
+        for widget in widgets:
+            widget.configure(state=state)
+        if busy:
+            self.spinner = Spinner(self.info_label, text)
+            self.spinner.start()
+        elif self.spinner is not None:
+            self.spinner.stop()
+            self.spinner = None
+
     def _submit(self):
+        if self.busy:
+            return
         if time.time() < self.locked_until:
             self.info_label.configure(text=f"Locked. Try again in {int(self.locked_until - time.time())}s")
             return
@@ -91,13 +106,21 @@ class EnterPasswordScreen:
         if not self.config.get("hello"):
             self.info_label.configure(text="No master password configured. Create one below.")
             return
-        try:
-            salt = load_or_create_salt()
-            key = derive_key(pw, salt)
-            f = Fernet(key)
-            token = self.config.get("hello")
-            f.decrypt(token.encode())
-        except Exception:
+        hello = self.config.get("hello")
+        params = vaultConfig.get_kdf_params(self.config)
+        wrapped_key = self.config.get("dek")
+
+        def verify():
+            session = VaultSession.unlock(pw, params=params, wrapped_key=wrapped_key)
+            session.check(hello)
+            return session
+
+        self._set_busy(True, "Unlocking")
+        run_in_background(self.ui.root, verify, self._on_submit_done)
+
+    def _on_submit_done(self, session, error):
+        self._set_busy(False)
+        if error is not None:
             self.attempts_left -= 1
             if self.attempts_left <= 0:
                 self.locked_until = time.time() + 30
@@ -111,7 +134,36 @@ class EnterPasswordScreen:
             self.attempts_label.configure(text=f"Attempts left: {self.attempts_left}")
             return
         # success
-        self.ui.master_password = pw
+        if not self.config.get("dek"):
+            # one-time move to envelope encryption: the current key becomes the
+            # wrapped data key, so no entry has to be re-encrypted
+            self.config["dek"] = session.wrapped_key()
+            self._save_config()
+        if self.config.get("rekey"):
+            self._resume_rekey(session)
+            return
+        self._enter(session)
+
+    def _enter(self, session):
+        """Upgrade the stored vault to the current schema if needed, then open the home screen."""
+        if migrations.pending(self.config):
+            self._set_busy(True, "Upgrading vault")
+            run_in_background(
+                self.ui.root,
+                lambda: migrations.migrate(session, self.config),
+                lambda result, error: self._on_upgrade_done(session, error),
+            )
+            return
+        self.ui.session = session
+        self.ui.show_screen("home")
+
+    def _on_upgrade_done(self, session, error):
+        self._set_busy(False)
+        if error is not None:
+            # the schema stamp is only saved after the upgraded vault is written
+            self.info_label.configure(text=f"Vault upgrade failed: {error}")
+            return
+        self.ui.session = session
         self.ui.show_screen("home")
 
     def _unlock(self):
@@ -121,6 +173,8 @@ class EnterPasswordScreen:
         self.attempts_label.configure(text=f"Attempts left: {self.attempts_left}")
 
     def _create_master(self):
+        if self.busy:
+            return
         a = self.new_entry.get().strip()
         b = self.new_confirm.get().strip()
         if not a:
@@ -130,49 +184,90 @@ class EnterPasswordScreen:
             self.info_label.configure(text="Passwords do not match.")
             return
 
+        self._set_busy(True, "Creating vault")
+        # tune the KDF to this machine, then derive with the chosen params
+        run_in_background(self.ui.root, lambda: VaultSession.create(a, params=calibrate()), self._on_create_done)
+
+    def _on_create_done(self, session, error):
+        self._set_busy(False)
+        if error is not None:
+            self.info_label.configure(text="Could not create master password.")
+            return
+
         # If legacy key exists and passwords present, migrate
         if LEGACY_KEY.exists() and self._has_passwords():
             try:
                 # load legacy Fernet
-                old_key = LEGACY_KEY.read_bytes()
-                old_f = Fernet(old_key)
-                data = json.loads(PASSWORD_PATH.read_text(encoding="utf-8")) or {}
-                migrated = {}
-                for site, creds in data.items():
-                    try:
-                        user = old_f.decrypt(creds["user"].encode()).decode()
-                        pw = old_f.decrypt(creds["password"].encode()).decode()
-                    except Exception:
-                        # if any entry fails, abort migration
-                        self.info_label.configure(text="Migration failed: cannot decrypt existing entries")
-                        return
-                    migrated[site] = {"user": encrypt.encrypt_message(user, a), "password": encrypt.encrypt_message(pw, a)}
-                PASSWORD_PATH.write_text(json.dumps(migrated, indent=4), encoding="utf-8")
-                # remove legacy key
-                try:
-                    LEGACY_KEY.unlink()
-                except Exception:
-                    pass
+                old_f = Fernet(LEGACY_KEY.read_bytes())
             except Exception:
                 self.info_label.configure(text="Migration failed.")
                 return
-        else:
-            # If passwords exist but no legacy key, ask user to confirm wiping
-            if self._has_passwords():
-                # require confirmation modal
-                if not self._confirm_wipe():
-                    self.info_label.configure(text="Creation cancelled — existing passwords kept.")
-                    return
-                # wipe
-                PASSWORD_PATH.write_text("{}", encoding="utf-8")
-
-        # store hello token
-        salt = load_or_create_salt()
-        token = Fernet(derive_key(a, salt)).encrypt(b"hello").decode()
-        self.config["hello"] = token
+            # the new data key has to be saved before any entry is encrypted under it;
+            # "rekey" marks the move as unfinished so the next unlock resumes it with the same key
+            vaultConfig.store_session_keys(self.config, session)
+            self.config["rekey"] = True
+            self._save_config()
+            self._rekey(session, old_f)
+            return
+
+        # If passwords exist but no legacy key, ask user to confirm wiping
+        if self._has_passwords():
+            # require confirmation modal
+            if not self._confirm_wipe():
+                self.info_label.configure(text="Creation cancelled — existing passwords kept.")
+                return
+            # wipe
+            manager.wipe_vault()
+
+        self._finish_create(session)
+
+    def _rekey(self, session, old_f):
+        """Re-encrypt password.json from the legacy secret.key to the session's data key."""
+        def progress(done, total):
+            # read by the spinner on the Tk thread
+            self.spinner.text = f"Migrating {done}/{total}"
+
+        self._set_busy(True, "Migrating")
+        run_in_background(
+            self.ui.root,
+            lambda: reencrypt.reencrypt_file(old_f, session.fernet, PASSWORD_PATH, progress=progress),
+            lambda result, error: self._on_migrate_done(session, error),
+        )
+
+    def _resume_rekey(self, session):
+        """Finish a legacy key migration that was interrupted after the new data key was saved."""
+        if reencrypt.decrypts_with(session.fernet, PASSWORD_PATH):
+            # password.json was already swapped; only the cleanup is missing
+            self._on_migrate_done(session, None)
+            return
+        try:
+            old_f = Fernet(LEGACY_KEY.read_bytes())
+        except Exception:
+            self.info_label.configure(text="Migration failed: the legacy key is missing")
+            return
+        # the checkpoint was written under this same data key, so the run resumes where it stopped
+        self._rekey(session, old_f)
+
+    def _on_migrate_done(self, session, error):
+        self._set_busy(False)
+        if error is not None:
+            # password.json is only swapped once every entry is re-encrypted, so it is still intact
+            self.info_label.configure(text="Migration failed: cannot decrypt existing entries")
+            return
+        # remove legacy key
+        try:
+            LEGACY_KEY.unlink()
+        except Exception:
+            pass
+        self.config.pop("rekey", None)
         self._save_config()
-        self.ui.master_password = a
-        self.ui.show_screen("home")
+        self._enter(session)
+
+    def _finish_create(self, session):
+        # store hello token, wrapped data key and the KDF params needed to derive the key again
+        vaultConfig.store_session_keys(self.config, session)
+        self._save_config()
+        self._enter(session)
 
     def _confirm_wipe(self):
         win = ctk.CTkToplevel(self.ui.root)
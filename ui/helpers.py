@@ -3,6 +3,7 @@
 # from json import load, dump, JSONDecodeError
 from doctest import master
 import os
+import threading
 from customtkinter import CTkLabel, CTkButton, CTkImage, CTkFrame, CTkFont, CENTER
 from PIL import Image
 from Functions.colorPicker import darker, ideal_text_color
@@ -146,6 +147,67 @@ def get_colors() -> dict:
     text_color = ideal_text_color(accent_color)
     return {"accent_color": accent_color, "hover_color": hover_color, "text_color": text_color}
     
+# ========= BACKGROUND WORK HELPERS ========== 
+def run_in_background(root, work, on_done, poll_ms: int = 50):
+    """Runs `work()` on a worker thread and hands the result back to the Tk thread.
+
+    Tk widgets must only be touched from the main thread, so the worker never
+    calls into Tk; the main loop polls it with `root.after` instead.
+
+    Args:
+        root (object): The CTk root (or any widget) used to schedule polling.
+        work (callable): Called with no arguments on the worker thread.
+        on_done (callable): Called on the Tk thread as `on_done(result, error)`;
+            `error` is the raised exception or None.
+        poll_ms (int, optional): How often to check the worker. Defaults to 50.
+    """
+    outcome = {"result": None, "error": None}
+
+    def worker():
+        try:
+            outcome["result"] = work()
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+
+    def poll():
+        if thread.is_alive():
+            root.after(poll_ms, poll)
+            return
+        on_done(outcome["result"], outcome["error"])
+
+    root.after(poll_ms, poll)
+
+
+class Spinner:
+    """Animates a label with trailing dots (e.g. "Unlocking...") until stopped."""
+    FRAMES = ("", ".", "..", "...")
+
+    def __init__(self, label, text: str, interval_ms: int = 300):
+        self.label = label
+        self.text = text
+        self.interval_ms = interval_ms
+        self._index = 0
+        self._job = None
+
+    def start(self):
+        self._tick()
+
+    def _tick(self):
+        self.label.configure(text=self.text + self.FRAMES[self._index % len(self.FRAMES)])
+        self._index += 1
+        self._job = self.label.after(self.interval_ms, self._tick)
+
+    def stop(self):
+        if self._job is not None:
+            try:
+                self.label.after_cancel(self._job)
+            except Exception:
+                pass
+            self._job = None
+
 # ========= Testing area ========= #
 if __name__ == "__main__":
     None
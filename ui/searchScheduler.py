@@ -0,0 +1,175 @@
+# ui/searchScheduler.py
+# Debounced search off the Tk thread: only the newest query is run and only its result reaches the widget
+import threading
+import time
+from collections import deque
+from typing import TypedDict
+
+# Quiet time after the last keystroke before a query is run
+DEBOUNCE_MS = 120
+# How often the Tk thread checks for a finished query
+POLL_MS = 15
+# Latency samples kept for the percentiles
+LATENCY_SAMPLES = 512
+
+
+class SearchStats(TypedDict):
+    # queries handed to submit()
+    submitted: int
+    # replaced by a newer keystroke before the debounce delay ran out
+    debounced: int
+    # dispatched but replaced before the worker picked them up, or finished after a newer one was dispatched
+    dropped: int
+    # results applied to the widget
+    applied: int
+    # keystroke-to-result and worker-only latency of applied queries, in ms
+    latency_p50: float
+    latency_p95: float
+    latency_p99: float
+    search_p50: float
+    search_p95: float
+
+
+def _percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))] * 1000
+
+
+class SearchScheduler:
+    """Runs `search(query)` on one worker thread and hands the newest outcome to `on_result(result, error)` on the Tk thread.
+
+    `submit(query)` restarts a debounce timer (`widget.after`); when it
+    fires the query gets a new generation number. The worker only ever
+    runs the newest pending query, and a result whose generation is no
+    longer current is discarded instead of being applied, so a burst of
+    typing costs one search and one list update. One worker keeps `search`
+    calls serialized, which SearchIndex relies on.
+    """
+
+    def __init__(self, widget, search, on_result, delay_ms: int = DEBOUNCE_MS, poll_ms: int = POLL_MS):
+        self.widget = widget
+        self.search = search
+        self.on_result = on_result
+        self.delay_ms = delay_ms
+        self.poll_ms = poll_ms
+
+        self._timer = None
+        self._polling = False
+        self._closed = False
+        self._generation = 0
+        # newest dispatched query not yet picked up: (generation, query, keystroke time)
+        self._pending = None
+        # newest finished query: (generation, result, error, keystroke time, search seconds)
+        self._done = None
+        # the worker is running a query
+        self._running = False
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._keystroke = None
+
+        self._counts = {"submitted": 0, "debounced": 0, "dropped": 0, "applied": 0}
+        self._latency = deque(maxlen=LATENCY_SAMPLES)
+        self._search_time = deque(maxlen=LATENCY_SAMPLES)
+
+    def submit(self, query: str, delay_ms: int | None = None):
+        """Run `query` once no newer one arrives for `delay_ms` (the debounce delay by default)."""
+        self._counts["submitted"] += 1
+        if self._timer is not None:
+            self.widget.after_cancel(self._timer)
+            self._counts["debounced"] += 1
+        # latency is measured from the keystroke that produced the query, debounce delay included
+        self._keystroke = time.perf_counter()
+        delay = self.delay_ms if delay_ms is None else delay_ms
+        self._timer = self.widget.after(delay, lambda: self._dispatch(query))
+
+    def _dispatch(self, query: str):
+        self._timer = None
+        with self._lock:
+            self._generation += 1
+            if self._pending is not None:
+                self._counts["dropped"] += 1
+            self._pending = (self._generation, query, self._keystroke)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._work, daemon=True)
+            self._thread.start()
+        self._wake.set()
+        if not self._polling:
+            self._polling = True
+            self.widget.after(self.poll_ms, self._poll)
+
+    def _work(self):
+        while True:
+            self._wake.wait()
+            with self._lock:
+                self._wake.clear()
+                job, self._pending = self._pending, None
+                self._running = job is not None
+            if self._closed:
+                return
+            if job is None:
+                continue
+            generation, query, keystroke = job
+            start = time.perf_counter()
+            result = error = None
+            try:
+                result = self.search(query)
+            except Exception as e:
+                error = e
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._running = False
+                if generation == self._generation:
+                    self._done = (generation, result, error, keystroke, elapsed)
+                else:
+                    # a newer query was dispatched while this one ran
+                    self._counts["dropped"] += 1
+
+    def _poll(self):
+        if self._closed or not self.widget.winfo_exists():
+            self.close()
+            return
+        with self._lock:
+            done, self._done = self._done, None
+            busy = self._pending is not None or self._running
+        if done is not None and done[0] == self._generation:
+            generation, result, error, keystroke, elapsed = done
+            self._counts["applied"] += 1
+            self._latency.append(time.perf_counter() - keystroke)
+            self._search_time.append(elapsed)
+            self.on_result(result, error)
+        if busy:
+            self.widget.after(self.poll_ms, self._poll)
+        else:
+            self._polling = False
+
+    def invalidate(self):
+        """Discard any query in flight (e.g. after the searched items changed)."""
+        with self._lock:
+            self._generation += 1
+            self._pending = None
+
+    def stats(self) -> SearchStats:
+        """Return the counters and latency percentiles collected so far."""
+        latency, search_time = list(self._latency), list(self._search_time)
+        return {
+            **self._counts,
+            "latency_p50": _percentile(latency, 50),
+            "latency_p95": _percentile(latency, 95),
+            "latency_p99": _percentile(latency, 99),
+            "search_p50": _percentile(search_time, 50),
+            "search_p95": _percentile(search_time, 95),
+        }
+
+    def close(self):
+        """Stop the worker; pending and in-flight queries are dropped."""
+        self._closed = True
+        if self._timer is not None:
+            try:
+                self.widget.after_cancel(self._timer)
+            except Exception:
+                pass
+            self._timer = None
+        self._wake.set()
@@ -4,9 +4,11 @@ import customtkinter as ctk
 from Functions.colorPicker import hex_to_hsv, hex_to_rgb, hsv_to_hex, darker, ideal_text_color
 from customtkinter import CENTER
 from ui.popups import simple_alert, success_alert
-from ui.helpers import create_label, create_title, add_buttons, divider, home_button, get_colors
+from tkinter import filedialog
+from ui.helpers import create_label, create_title, add_buttons, divider, home_button, get_colors, run_in_background
 from Functions.themeManager import get_theme, set_theme
-from ui.vaultSettings import change_master_password, wipe_all_passwords
+from ui.vaultSettings import change_master_password, wipe_all_passwords, export_passwords
+from Functions import importer
 
 class CTkColorPicker(ctk.CTkFrame):
     """UI-only color picker that uses helper converters from Functions/colorPicker."""
@@ -90,6 +92,25 @@ class SettingsScreen:
         except Exception as e:
             simple_alert(self.frame, "Error", str(e))
 
+    def import_passwords(self):
+        path = filedialog.askopenfilename(
+            parent=self.frame, title="Import passwords",
+            filetypes=[("Chrome, Firefox or Bitwarden export", "*.csv *.json"), ("All files", "*.*")])
+        if not path:
+            return
+        self.import_button.configure(state="disabled", text="Importing...")
+        run_in_background(self.frame, lambda: importer.import_file(path, self.ui.session), self._on_import_done)
+
+    def _on_import_done(self, result, error):
+        # the user may have left the settings screen while the import ran
+        if not self.import_button.winfo_exists():
+            return
+        self.import_button.configure(state="normal", text="Import Passwords")
+        if error is not None:
+            simple_alert(self.frame, "Error", f"Import failed: {error}")
+            return
+        success_alert(self.frame, importer.summary(result))
+
     def add_widgets(self):
         self.title = create_title(self.frame, text="Settings")
         self.title.place(relx=0.5, rely=0.05, anchor=CENTER)
@@ -121,8 +142,14 @@ class SettingsScreen:
 
         divider(self.frame).place(relx=0.5, rely=0.8, anchor=CENTER)
 
-        self.change_pw_button = add_buttons(self.frame, text="Change Password", colors_dict=self.colors, command=lambda: change_master_password(self.frame, self.ui.master_password))
+        self.change_pw_button = add_buttons(self.frame, text="Change Password", colors_dict=self.colors, command=lambda: change_master_password(self.frame, self.ui.session))
         self.change_pw_button.place(relx=0.05, rely=0.83, relwidth=0.4)
 
-        self.wipe_pw_button = add_buttons(self.frame, text="Wipe all Passwords", colors_dict=self.red_colors, command=lambda: wipe_all_passwords(self.frame, self.ui.master_password))
-        self.wipe_pw_button.place(relx=0.55, rely=0.83, relwidth=0.4)
\ No newline at end of file
+        self.wipe_pw_button = add_buttons(self.frame, text="Wipe all Passwords", colors_dict=self.red_colors, command=lambda: wipe_all_passwords(self.frame, self.ui.session))
+        self.wipe_pw_button.place(relx=0.55, rely=0.83, relwidth=0.4)
+
+        self.import_button = add_buttons(self.frame, text="Import Passwords", colors_dict=self.colors, command=self.import_passwords)
+        self.import_button.place(relx=0.05, rely=0.92, relwidth=0.4)
+
+        self.export_button = add_buttons(self.frame, text="Export Passwords", colors_dict=self.colors, command=lambda: export_passwords(self.frame, self.ui.session))
+        self.export_button.place(relx=0.55, rely=0.92, relwidth=0.4)
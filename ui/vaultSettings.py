@@ -1,24 +1,21 @@
 import customtkinter as ctk
-from ui.helpers import create_label, divider, add_buttons, get_colors, DEFAULT_FONT
+from tkinter import filedialog
+from ui.helpers import create_label, divider, add_buttons, get_colors, run_in_background, DEFAULT_FONT
 from Functions.salt import load_or_create_salt
 from Functions.colorPicker import darker
-from Functions.kdf import derive_key
-from cryptography.fernet import Fernet
-from ui.popups import password_mismatch_alert, success_alert
-from pathlib import Path
-import json
+from Functions.session import VaultSession
+from Functions.kdf import calibrate
+from Functions import vaultConfig
+from ui.popups import password_mismatch_alert, success_alert, simple_alert
 
-from Functions import fileManager
-
-CONFIG_PATH = fileManager.data_path("config.json")
-PASSWORD_PATH = fileManager.data_path("password.json")
+from Functions import manager, exporter
 
 COLORS = get_colors()
 ACCENT_COLOR = COLORS['accent_color']
 HOVER_COLOR = COLORS['hover_color']
 TEXT_COLOR = COLORS['text_color']
 
-def change_master_password(parent, master_password: str):
+def change_master_password(parent, session: VaultSession):
     """Open a modal to change the master password.
 
     `parent` is the parent window (usually the settings window or root).
@@ -36,63 +33,47 @@ def change_master_password(parent, master_password: str):
     n2 = ctk.CTkEntry(sub, show="*", width=300, font=DEFAULT_FONT, placeholder_text="Confirm new master password")
     n2.pack()
 
+    def rewrap(new: str):
+        # Only the wrapped data key changes; password.json is left untouched.
+        session.rewrap(new, load_or_create_salt(), calibrate())
+        cfg = vaultConfig.load_config()
+        vaultConfig.store_session_keys(cfg, session)
+        vaultConfig.save_config(cfg)
+        # backups must not keep a data key wrapped under the old password
+        manager.rewrap_backups(cfg)
+
+    def on_done(result, error):
+        if not sub.winfo_exists():
+            return
+        if error is not None:
+            simple_alert(sub, "Error", f"Changing the master password failed: {error}")
+            change_button.configure(state="normal", text="Change Password")
+            return
+        success_alert(sub, "Master password changed successfully.")
+        sub.destroy()
+
     def do_change():
         new = n1.get().strip()
         newc = n2.get().strip()
         if not new or new != newc:
             password_mismatch_alert(sub)
             return
-        try:
-            with open(PASSWORD_PATH, "r", encoding="utf-8") as f:
-                data = json.load(f) or {}
-        except Exception:
-            data = {}
-        reencrypted = {}
-        salt = load_or_create_salt()
-        old_key = derive_key(master_password, salt)
-        new_key = derive_key(new, salt)
-        old_f = Fernet(old_key)
-        new_f = Fernet(new_key)
-        for site, creds in data.items():
-            try:
-                user = old_f.decrypt(creds["user"].encode()).decode()
-                pw = old_f.decrypt(creds["password"].encode()).decode()
-            except Exception:
-                continue
-            reencrypted[site] = {"user": new_f.encrypt(user.encode()).decode(), "password": new_f.encrypt(pw.encode()).decode()}
-        PASSWORD_PATH.write_text(json.dumps(reencrypted, indent=4), encoding="utf-8")
-        token = new_f.encrypt(b"hello").decode()
-        cfg = {}
-        if CONFIG_PATH.exists():
-            try:
-                cfg = json.loads(CONFIG_PATH.read_text(encoding="utf-8")) or {}
-            except Exception:
-                cfg = {}
-        cfg["hello"] = token
-        CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
-        CONFIG_PATH.write_text(json.dumps(cfg), encoding="utf-8")
-        success_alert(sub, "Master password changed successfully. \n Please restart the app")
-        sub.destroy()
+        # calibrate() and the key derivation take a second or more; keep them off the Tk thread
+        change_button.configure(state="disabled", text="Changing...")
+        run_in_background(sub, lambda: rewrap(new), on_done)
 
-    add_buttons(sub, text="Change Password", colors_dict=COLORS, command=do_change).pack(pady=12)
+    change_button = add_buttons(sub, text="Change Password", colors_dict=COLORS, command=do_change)
+    change_button.pack(pady=12)
     parent.wait_window(sub)
 
 
-def wipe_all_passwords(parent, master_password: str):
+def wipe_all_passwords(parent, session: VaultSession):
     """Open a confirmation modal and wipe all stored passwords."""
     def do_wipe(confirm):
-        PASSWORD_PATH.write_text("{}", encoding="utf-8")
-        salt = load_or_create_salt()
-        token = Fernet(derive_key(master_password, salt)).encrypt(b"hello").decode()
-        cfg = {}
-        if CONFIG_PATH.exists():
-            try:
-                cfg = json.loads(CONFIG_PATH.read_text(encoding="utf-8")) or {}
-            except Exception:
-                cfg = {}
-        cfg["hello"] = token
-        CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
-        CONFIG_PATH.write_text(json.dumps(cfg), encoding="utf-8")
+        manager.wipe_vault()
+        cfg = vaultConfig.load_config()
+        vaultConfig.store_session_keys(cfg, session)
+        vaultConfig.save_config(cfg)
         success_alert(confirm, "Vault wiped successfully.")
         confirm.destroy()
 
@@ -106,4 +87,66 @@ def wipe_all_passwords(parent, master_password: str):
     btnf.pack(pady=6)
     add_buttons(btnf, text="Yes, wipe", command=lambda: do_wipe(confirm), fg_color="#b62828", hover_color=darker("#b62828")).pack(side="left", padx=8)
     add_buttons(btnf, text="Cancel", command=confirm.destroy).pack(side="left", padx=8)
-    parent.wait_window(confirm)
\ No newline at end of file
+    parent.wait_window(confirm)
+
+
+EXPORT_CHOICES = {
+    "Encrypted archive (.vmlx)": ("archive", exporter.ARCHIVE_SUFFIX),
+    "Plain CSV (.csv)": ("csv", ".csv"),
+    "Plain JSON (.json)": ("json", ".json"),
+}
+
+
+def export_passwords(parent, session: VaultSession):
+    """Open a modal to export the vault as an encrypted archive or a plaintext CSV/JSON file."""
+    sub = ctk.CTkToplevel(parent)
+    sub.title("Export Passwords")
+    sub.geometry("400x330")
+    sub.transient(parent)
+    sub.grab_set()
+
+    create_label(sub, text="Format:").pack(pady=(12, 4))
+    fmt_var = ctk.StringVar(value=next(iter(EXPORT_CHOICES)))
+    ctk.CTkOptionMenu(sub, variable=fmt_var, values=list(EXPORT_CHOICES), width=300, font=DEFAULT_FONT).pack()
+    create_label(sub, text="Compression:").pack(pady=(8, 4))
+    comp_var = ctk.StringVar(value="zlib")
+    ctk.CTkOptionMenu(sub, variable=comp_var, values=exporter.compressions(), width=300, font=DEFAULT_FONT).pack()
+    create_label(sub, text="Archive passphrase:").pack(pady=(8, 4))
+    p1 = ctk.CTkEntry(sub, show="*", width=300, font=DEFAULT_FONT, placeholder_text="Only for encrypted archives")
+    p1.pack()
+    p2 = ctk.CTkEntry(sub, show="*", width=300, font=DEFAULT_FONT, placeholder_text="Confirm passphrase")
+    p2.pack(pady=(4, 0))
+
+    def on_done(result, error):
+        if not sub.winfo_exists():
+            return
+        if error is not None:
+            simple_alert(sub, "Error", f"Export failed: {error}")
+            export_button.configure(state="normal", text="Export")
+            return
+        message = f"Exported {result['rows']} entries."
+        if result["skipped"]:
+            message += f"\n{result['skipped']} unreadable entries were left out."
+        success_alert(sub, message)
+        sub.destroy()
+
+    def do_export():
+        fmt, suffix = EXPORT_CHOICES[fmt_var.get()]
+        compression = comp_var.get()
+        passphrase = p1.get()
+        if fmt == "archive" and (not passphrase or passphrase != p2.get()):
+            password_mismatch_alert(sub)
+            return
+        if compression != "none" and fmt != "archive":
+            suffix += ".gz" if compression == "zlib" else ".zst"
+        path = filedialog.asksaveasfilename(parent=sub, title="Export passwords", defaultextension=suffix,
+                                            initialfile="VaultMLN-export" + suffix)
+        if not path:
+            return
+        export_button.configure(state="disabled", text="Exporting...")
+        run_in_background(sub, lambda: exporter.export_vault(path, session, fmt, compression, passphrase or None),
+                          on_done)
+
+    export_button = add_buttons(sub, text="Export", colors_dict=COLORS, command=do_export)
+    export_button.pack(pady=12)
+    parent.wait_window(sub)
@@ -0,0 +1,138 @@
+# ui/virtualList.py
+# Scrollable list that draws any number of items through a fixed pool of row buttons
+import math
+import customtkinter as ctk
+from customtkinter import CTkFrame
+from ui.helpers import DEFAULT_FONT
+
+ROW_COLOR = "#3A3A3A"
+ROW_HOVER = "#5C5C5C"
+SELECTED_COLOR = "#123456"
+SELECTED_HOVER = "#22486E"
+
+# Rows moved per mouse wheel notch
+WHEEL_ROWS = 3
+
+
+def item_key(item):
+    """What identifies `item` across item lists: its site and entry ref (see SiteDisplayItem), else its label."""
+    if isinstance(item, dict):
+        if "ref" in item:
+            return item.get("site"), item["ref"]
+        return item.get("site"), item.get("label")
+    return item
+
+
+class VirtualList(CTkFrame):
+    """Shows `items` ({"label", "site", "username", ...}) in rows of `row_height` pixels.
+
+    Only as many CTkButtons exist as fit in the frame. Scrolling or a new
+    item list rebinds their text and metadata (`.site`, `.username`,
+    `.item`) instead of creating widgets, so the cost of a refresh does
+    not depend on the number of items. `on_click(button)` gets the row
+    button that was clicked. The selected item stays highlighted while it
+    is scrolled out of view and back, across filters that keep it, and
+    when the list is replaced by copies of its items (e.g. with resolved
+    usernames), since it is matched by `item_key`, not identity.
+    """
+
+    def __init__(self, master, on_click, row_height: int = 36, **kwargs):
+        super().__init__(master, **kwargs)
+        self.on_click = on_click
+        self.row_height = row_height
+        self.items: list = []
+        self.top = 0
+        # item_key of the selected item
+        self.selected_key = None
+        self.rows: list = []
+
+        self.viewport = CTkFrame(self, fg_color="transparent")
+        self.viewport.pack(side="left", fill="both", expand=True)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.viewport.bind("<Configure>", lambda event: self._fit(event.height))
+        self._bind_wheel(self.viewport)
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel)
+        # X11 reports the wheel as buttons 4 and 5
+        widget.bind("<Button-4>", lambda event: self.scroll_by(-WHEEL_ROWS))
+        widget.bind("<Button-5>", lambda event: self.scroll_by(WHEEL_ROWS))
+
+    def _visible(self) -> int:
+        return max(1, math.ceil(self.viewport.winfo_height() / self.row_height))
+
+    def _fit(self, height: int):
+        """Grow the row pool to cover `height` pixels; rows are never destroyed, only hidden."""
+        needed = max(1, math.ceil(height / self.row_height))
+        while len(self.rows) < needed:
+            row = ctk.CTkButton(self.viewport, text="", anchor="w", height=self.row_height - 4,
+                                fg_color=ROW_COLOR, hover_color=ROW_HOVER, font=DEFAULT_FONT, cursor="hand2")
+            row.configure(command=lambda b=row: self._on_row_click(b))
+            row.row_index = None
+            row.site = row.username = row.item = None
+            self._bind_wheel(row)
+            self.rows.append(row)
+        self.render()
+
+    def set_items(self, items):
+        """Show a new item list from the top, keeping the selection if it is still in it."""
+        self.items = list(items)
+        self.top = 0
+        self.render(rebind=True)
+
+    def select(self, item):
+        self.selected_key = None if item is None else item_key(item)
+        self.render(rebind=True)
+
+    def scroll_by(self, rows: int):
+        self.top += rows
+        self.render()
+
+    def _on_wheel(self, event):
+        # Windows reports multiples of 120 per notch, macOS small deltas
+        steps = event.delta // 120 if abs(event.delta) >= 120 else (1 if event.delta > 0 else -1)
+        self.scroll_by(-steps * WHEEL_ROWS)
+
+    def _on_scrollbar(self, action, *args):
+        if action == "moveto":
+            self.top = round(float(args[0]) * len(self.items))
+        elif action == "scroll":
+            amount = int(args[0])
+            self.top += amount * (self._visible() if args[1] == "pages" else 1)
+        self.render()
+
+    def render(self, rebind: bool = False):
+        """Bind the visible slice of items to the row pool and update the scrollbar."""
+        visible = self._visible()
+        total = len(self.items)
+        self.top = max(0, min(self.top, total - visible))
+        for n, row in enumerate(self.rows):
+            index = self.top + n
+            if n >= visible or index >= total:
+                if row.row_index is not None:
+                    row.place_forget()
+                    row.row_index = None
+                continue
+            if row.row_index == index and not rebind:
+                continue
+            item = self.items[index]
+            selected = self.selected_key is not None and item_key(item) == self.selected_key
+            row.configure(text=item.get("label") if isinstance(item, dict) else str(item),
+                          fg_color=SELECTED_COLOR if selected else ROW_COLOR,
+                          hover_color=SELECTED_HOVER if selected else ROW_HOVER)
+            row.site = item.get("site") if isinstance(item, dict) else None
+            row.username = item.get("username") if isinstance(item, dict) else None
+            # display item, kept for labels whose username has not been decrypted yet
+            row.item = item if isinstance(item, dict) else None
+            if row.row_index is None:
+                row.place(x=0, y=n * self.row_height + 2, relwidth=1.0)
+            row.row_index = index
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _on_row_click(self, row):
+        if row.row_index is not None:
+            self.on_click(row)